@@ -0,0 +1,91 @@
+"""Tokens de entrada enviados ao LLM para documentar modelos sintéticos, comparados ao envio original: o prompt e os
+DataFrames inteiros (to_string) numa mesma conversa, repetidos nas quatro chamadas, uma por seção.
+
+Conta com o tiktoken quando ele está instalado e, sem ele, estima em 4 caracteres por token. Nenhuma chamada é feita:
+as mensagens são capturadas antes de irem ao LLM.
+
+Uso: python -m benchmarks.prompt_tokens --sizes 100 1000 10000"""
+import argparse
+from io import BytesIO
+
+from benchmarks.synthetic import generate_pbit
+from documentador import documentation
+from documentador.config import LLM_MODEL
+from documentador.parsers import parse_pbit
+
+def token_counter():
+    """Contador do tiktoken para o modelo configurado ou, se o tiktoken não estiver instalado ou não conseguir baixar a
+    codificação, a estimativa de 4 caracteres por token"""
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(LLM_MODEL)
+        except KeyError:
+            encoding = tiktoken.get_encoding('o200k_base')
+    except Exception:
+        return lambda text: len(text) // 4, 'estimada, 4 caracteres por token'
+    return lambda text: len(encoding.encode(text)), f'tiktoken {encoding.name}'
+
+def original_messages(model):
+    """As quatro chamadas do Documenta original, cada uma com as instruções das anteriores acumuladas"""
+    df = model.desnormalizar()
+    tables_df = df[df['NomeTabela'].notnull() & df['FonteDados'].notnull()][['NomeTabela', 'FonteDados']].drop_duplicates().reset_index(drop=True)
+    measures_df = df[df['NomeMedida'].notnull() & df['ExpressaoMedida'].notnull()][['NomeMedida', 'ExpressaoMedida']].drop_duplicates().reset_index(drop=True)
+    text = f"""
+    Relatório: {model.nome}
+
+    Tabelas:
+    {tables_df['NomeTabela'].to_string(index=False)}
+
+    Fontes dos dados das tabelas:
+    {tables_df.to_string(index=False)}
+
+    Medidas:
+    {measures_df.to_string(index=False)}
+    """
+    messages = [
+        {'role': 'system', 'content': 'Você é um documentador especializado em Power BI.'},
+        {'role': 'user', 'content': f'{documentation.prompt()}\n{text}\n<FIM DADOS RELATORIO POWER BI>'},
+    ]
+    calls = []
+    for instruction in documentation.DOCUMENTATION_SECTIONS.values():
+        messages = messages + [{'role': 'user', 'content': instruction}]
+        calls.append(messages)
+    return calls
+
+def current_messages(model):
+    """As mensagens de todos os lotes do Documenta atual, capturadas no lugar da chamada ao LLM"""
+    calls = []
+
+    def capture(messages, on_item=None):
+        calls.append(messages)
+        return {}
+
+    original = documentation.client_chat
+    documentation.client_chat = capture
+    try:
+        sections, _ = documentation.text_to_document(model)
+        documentation.Documenta(documentation.prompt(), sections)
+    finally:
+        documentation.client_chat = original
+    return calls
+
+def count(calls, tokens):
+    return sum(tokens(message['content']) for messages in calls for message in messages)
+
+def main():
+    parser = argparse.ArgumentParser(description='Tokens de entrada enviados ao LLM, antes e depois da compactação')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='Quantidade de objetos de cada modelo')
+    args = parser.parse_args()
+
+    tokens, method = token_counter()
+    print(f'Contagem: {method}')
+    print(f"{'objetos':>8} {'original':>10} {'atual':>10} {'chamadas':>9} {'redução':>8}")
+    for n_objects in args.sizes:
+        model = parse_pbit(BytesIO(generate_pbit(n_objects)), 'Relatorio sintetico')
+        before, after = original_messages(model), current_messages(model)
+        before_tokens, after_tokens = count(before, tokens), count(after, tokens)
+        print(f'{n_objects:>8} {before_tokens:>10} {after_tokens:>10} {len(after):>9} {1 - after_tokens / before_tokens:>8.1%}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark das etapas do documentador com modelos sintéticos de 10 a 10.000 objetos, rodando contra os servidores locais.
+
+Uso: python -m benchmarks.run --sizes 10 100 1000 10000 --json resultado.json"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from types import SimpleNamespace
+
+from benchmarks.stand_ins import ChatStandIn, PowerBIStandIn
+from benchmarks.synthetic import generate_pbit, generate_workspace
+
+def measure(function, *args, memory=True):
+    """Roda a etapa uma vez para medir o tempo e, se memory, outra vez com o tracemalloc para medir o pico de memória,
+    já que o tracemalloc deixa a execução mais lenta"""
+    gc.collect()
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return result, elapsed, peak
+
+def run_size(app, n_objects, powerbi, llm_cache_dir, n_workspaces, memory=True):
+    """Mede cada etapa para um modelo de n_objects objetos"""
+    results = []
+
+    def stage(name, function, *args):
+        if name in ('Documenta',):
+            # Cada medição precisa chamar o LLM de verdade, então o cache é limpo antes
+            function = with_clean_cache(function, llm_cache_dir)
+        result, elapsed, peak = measure(function, *args, memory=memory)
+        results.append({'objetos': n_objects, 'etapa': name, 'segundos': round(elapsed, 4), 'pico_mb': round(peak / 2 ** 20, 2) if peak is not None else None})
+        return result
+
+    headers = {'Authorization': 'Bearer benchmark', 'Content-Type': 'application/json'}
+    powerbi.n_objects = n_objects
+    stage('scan_workspaces', app.scan_workspaces, headers, powerbi.workspace_ids[:n_workspaces])
+
+    pbit = generate_pbit(n_objects)
+    model = stage('upload_file', lambda: app.parse_pbit(BytesIO(pbit), 'Relatorio sintetico'))
+
+    workspace = generate_workspace(powerbi.workspace_ids[0], n_objects)
+    stage('clean_reports', app.clean_reports, workspace, workspace['datasets'][0]['name'])
+
+    sections, measures_df = stage('text_to_document', app.text_to_document, model)
+    documentation = stage('Documenta', app.Documenta, app.prompt(), sections)
+    shutil.rmtree(llm_cache_dir, ignore_errors=True)
+    results.append({'objetos': n_objects, 'etapa': 'Documenta 1º item', 'segundos': round(first_item_seconds(app, app.prompt(), sections), 4), 'pico_mb': None})
+    stage('generate_excel', app.generate_excel, documentation, measures_df)
+    stage('generate_docx', app.generate_docx, documentation, measures_df)
+
+    return results
+
+def first_item_seconds(app, prompt, sections):
+    """Tempo até o primeiro item da documentação chegar pelo stream, que é quando a tela começa a mostrar algo"""
+    started = time.perf_counter()
+    first = []
+    app.Documenta(prompt, sections, on_item=lambda section, item: first or first.append(time.perf_counter() - started))
+    return first[0] if first else time.perf_counter() - started
+
+def load_app():
+    """Reúne as etapas medidas, que ficam em módulos diferentes do pacote documentador"""
+    documentation = importlib.import_module('documentador.documentation')
+    exporters = importlib.import_module('documentador.exporters')
+    parsers = importlib.import_module('documentador.parsers')
+    scanner = importlib.import_module('documentador.scanner')
+    return SimpleNamespace(
+        scan_workspaces=scanner.scan_workspaces,
+        clean_reports=scanner.clean_reports,
+        parse_pbit=parsers.parse_pbit,
+        text_to_document=documentation.text_to_document,
+        prompt=documentation.prompt,
+        Documenta=documentation.Documenta,
+        generate_excel=exporters.generate_excel,
+        generate_docx=exporters.generate_docx,
+    )
+
+def with_clean_cache(function, cache_dir):
+    def wrapper(*args):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return function(*args)
+    return wrapper
+
+def print_table(results):
+    print(f"{'objetos':>8}  {'etapa':<18} {'segundos':>10} {'pico (MB)':>10}")
+    for row in results:
+        peak = '-' if row['pico_mb'] is None else f"{row['pico_mb']:.2f}"
+        print(f"{row['objetos']:>8}  {row['etapa']:<18} {row['segundos']:>10.4f} {peak:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das etapas do documentador com modelos sintéticos')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000], help='Quantidade de objetos (tabelas + colunas + medidas) de cada modelo')
+    parser.add_argument('--workspaces', type=int, default=3, help='Workspaces escaneadas por rodada')
+    parser.add_argument('--scan-delay', type=float, default=1.0, help='Segundos até o scan do servidor local terminar')
+    parser.add_argument('--throttle-every', type=int, default=10, help='Responde 429 a cada N requisições ao Power BI (0 desliga)')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Latência simulada de cada chamada ao chat completions')
+    parser.add_argument('--no-memory', action='store_true', help='Mede apenas o tempo, sem a segunda rodada com tracemalloc')
+    parser.add_argument('--json', help='Arquivo onde gravar os resultados em JSON')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='documentador-benchmark-')
+
+    with PowerBIStandIn(n_workspaces=max(args.workspaces, 1), scan_delay=args.scan_delay, throttle_every=args.throttle_every) as powerbi, ChatStandIn(latency=args.llm_latency) as chat:
+        # As variáveis precisam existir antes de importar o pacote, que as lê ao carregar documentador.config
+        os.environ.update({
+            'POWERBI_API_URL': powerbi.api_url,
+            'OPENAI_BASE_URL': chat.api_url,
+            'API_KEY': 'benchmark',
+            'LLM_CACHE_DIR': os.path.join(work_dir, 'llm'),
+            'SNAPSHOT_DIR': os.path.join(work_dir, 'snapshots'),
+            'DOCUMENTATION_DIR': os.path.join(work_dir, 'documentacoes'),
+        })
+        app = load_app()
+
+        results = []
+        try:
+            for n_objects in args.sizes:
+                results += run_size(app, n_objects, powerbi, os.environ['LLM_CACHE_DIR'], args.workspaces, memory=not args.no_memory)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Servidores HTTP locais que imitam a API de administração do Power BI e o chat completions da OpenAI,
+para rodar os benchmarks sem rede"""
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.synthetic import generate_workspace
+
+class StandInServer:
+    """Base dos servidores: sobe um ThreadingHTTPServer em uma thread e encaminha as requisições para handle()"""
+
+    def __init__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.dispatch(self, 'GET')
+
+            def do_POST(self):
+                server.dispatch(self, 'POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def dispatch(self, handler, method):
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length)) if length else None
+        with self.lock:
+            self.requests += 1
+            count = self.requests
+
+        status, headers, payload = self.handle(method, parsed.path, parse_qs(parsed.query), body, count)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', headers.pop('Content-Type', 'application/json'))
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def handle(self, method, path, query, body, count):
+        raise NotImplementedError
+
+class PowerBIStandIn(StandInServer):
+    """Imita admin/groups, workspaces/modified, getInfo, scanStatus e scanResult. A cada throttle_every requisições
+    responde 429 com Retry-After, e cada scan só termina scan_delay segundos depois do getInfo"""
+
+    def __init__(self, n_workspaces=10, n_objects=100, n_datasets=1, scan_delay=1.0, throttle_every=10, retry_after=0):
+        super().__init__()
+        self.workspace_ids = [str(uuid.UUID(int=i + 1)) for i in range(n_workspaces)]
+        self.n_objects = n_objects
+        self.n_datasets = n_datasets
+        self.scan_delay = scan_delay
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.scans = {}
+
+    @property
+    def api_url(self):
+        return f'{self.url}/v1.0/myorg'
+
+    def handle(self, method, path, query, body, count):
+        if self.throttle_every and count % self.throttle_every == 0:
+            return 429, {'Retry-After': str(self.retry_after)}, {'error': {'code': 'TooManyRequests'}}
+
+        path = path.removeprefix('/v1.0/myorg')
+
+        if path == '/admin/groups':
+            top = int(query.get('$top', ['100'])[0])
+            skip = int(query.get('$skip', ['0'])[0])
+            page = self.workspace_ids[skip:skip + top]
+            return 200, {}, {'value': [{'id': workspace_id, 'name': f'Workspace {workspace_id[:8]}', 'type': 'Workspace', 'state': 'Active'} for workspace_id in page]}
+
+        if path == '/admin/workspaces/modified':
+            return 200, {}, [{'id': workspace_id} for workspace_id in self.workspace_ids[::2]]
+
+        if path == '/admin/workspaces/getInfo' and method == 'POST':
+            scan_id = str(uuid.uuid4())
+            with self.lock:
+                self.scans[scan_id] = (time.monotonic(), body['workspaces'])
+            return 202, {}, {'id': scan_id, 'createdDateTime': '2024-01-01T00:00:00Z', 'status': 'NotStarted'}
+
+        match = re.fullmatch(r'/admin/workspaces/(scanStatus|scanResult)/([^/]+)', path)
+        if match and match.group(2) in self.scans:
+            started_at, workspace_ids = self.scans[match.group(2)]
+            done = time.monotonic() - started_at >= self.scan_delay
+
+            if match.group(1) == 'scanStatus':
+                return 200, {}, {'id': match.group(2), 'status': 'Succeeded' if done else 'Running'}
+            if not done:
+                return 400, {}, {'error': {'code': 'ScanNotReady'}}
+            workspaces = [generate_workspace(workspace_id.lower(), self.n_objects, self.n_datasets) for workspace_id in workspace_ids]
+            return 200, {}, {'workspaces': workspaces, 'datasourceInstances': []}
+
+        return 404, {}, {'error': {'code': 'NotFound', 'path': path}}
+
+class ChatStandIn(StandInServer):
+    """Imita o /v1/chat/completions: devolve a seção pedida na última mensagem com uma descrição para cada item
+    (linhas 'nome | expressão') dos dados enviados, depois de latency segundos"""
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+
+    @property
+    def api_url(self):
+        return f'{self.url}/v1'
+
+    def handle(self, method, path, query, body, count):
+        if path != '/v1/chat/completions':
+            return 404, {}, {'error': {'message': 'not found'}}
+
+        time.sleep(self.latency)
+        content = json.dumps(self.document(body['messages']), ensure_ascii=False)
+        prompt_tokens = sum(len(message['content']) for message in body['messages']) // 4
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4, 'total_tokens': prompt_tokens + len(content) // 4}
+        base = {'id': f'chatcmpl-{uuid.uuid4().hex}', 'created': int(time.time()), 'model': body.get('model', 'gpt-4o')}
+
+        if body.get('stream'):
+            return 200, {'Content-Type': 'text/event-stream'}, self.stream(base, content, usage)
+        return 200, {}, {
+            **base,
+            'object': 'chat.completion',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': usage
+        }
+
+    def stream(self, base, content, usage, chunk_size=16):
+        """Resposta em server-sent events, como o stream=True da OpenAI: pedaços de chunk_size caracteres e, por último,
+        um evento só com o usage"""
+        chunk = {**base, 'object': 'chat.completion.chunk'}
+        events = [{**chunk, 'choices': [{'index': 0, 'delta': {'content': content[i:i + chunk_size]}, 'finish_reason': None}], 'usage': None}
+                  for i in range(0, len(content), chunk_size)]
+        events.append({**chunk, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': None})
+        events.append({**chunk, 'choices': [], 'usage': usage})
+        lines = [f'data: {json.dumps(event, ensure_ascii=False)}\n\n' for event in events] + ['data: [DONE]\n\n']
+        return ''.join(lines).encode('utf-8')
+
+    def document(self, messages):
+        section = re.search(r"parte do json '(\w+)'", messages[-1]['content']).group(1)
+        data = '\n'.join(message['content'] for message in messages[:-1]).split('<INICIO DADOS RELATORIO POWER BI>')[-1]
+        names = [line.split(' | ', 1)[0].strip() for line in data.splitlines() if ' | ' in line and not line.rstrip().endswith(':')]
+
+        if section == 'Relatorio':
+            return {'Relatorio': {
+                'Titulo': 'Relatório sintético',
+                'Descricao': 'Relatório gerado para benchmark.',
+                'Principais_KPIs_e_Metricas': names[:3],
+                'Publico_Alvo': 'Time de performance',
+                'Exemplos_de_Uso': ['Benchmark']
+            }}
+        if section == 'Fontes_de_Dados':
+            return {section: [{'Nome': f'Fonte de {name}', 'Descricao': f'Fonte dos dados de {name}.', 'Tabelas_Contidas_no_M': [name]} for name in names]}
+        return {section: [{'Nome': name, 'Descricao': f'Descrição sintética de {name}.'} for name in names]}
@@ -0,0 +1,79 @@
+"""Tempo de importação (partida a frio) dos módulos do documentador, cada um em um processo novo.
+
+Confere também que openai, msal, requests, docx e xlsxwriter continuam fora da importação: eles só devem ser carregados no
+primeiro uso. Com --budget, sai com erro se algum módulo passar do tempo permitido, para ser usado na CI.
+
+Uso: python -m benchmarks.startup --runs 5 --budget documentador.batch=0.5 main=1.5"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    'documentador.config',
+    'documentador.parsers',
+    'documentador.scanner',
+    'documentador.documentation',
+    'documentador.exporters',
+    'documentador.batch',
+    'main',
+]
+LAZY_BACKENDS = ['openai', 'msal', 'requests', 'docx', 'xlsxwriter']
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+__import__({module!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{'segundos': elapsed, 'carregados': [name for name in {backends!r} if name in sys.modules]}}))
+"""
+
+def measure(module, runs):
+    """Mediana do tempo de importação em runs processos novos e os backends pesados que a importação carregou"""
+    times, loaded = [], set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module, backends=LAZY_BACKENDS)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        times.append(result['segundos'])
+        loaded.update(result['carregados'])
+    return statistics.median(times), sorted(loaded)
+
+def parse_budget(values):
+    budget = {}
+    for value in values:
+        module, _, seconds = value.partition('=')
+        budget[module] = float(seconds)
+    return budget
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de importação dos módulos do documentador')
+    parser.add_argument('--modules', nargs='+', default=MODULES, help='Módulos a medir')
+    parser.add_argument('--runs', type=int, default=5, help='Processos por módulo; o resultado é a mediana')
+    parser.add_argument('--budget', nargs='+', default=[], metavar='MODULO=SEGUNDOS', help='Tempo máximo de importação por módulo')
+    parser.add_argument('--json', help='Arquivo onde gravar os resultados em JSON')
+    args = parser.parse_args()
+
+    budget = parse_budget(args.budget)
+    results, failures = [], []
+    print(f"{'módulo':<28} {'segundos':>10}  backends carregados")
+    for module in args.modules:
+        seconds, loaded = measure(module, args.runs)
+        results.append({'modulo': module, 'segundos': round(seconds, 4), 'carregados': loaded})
+        print(f"{module:<28} {seconds:>10.4f}  {', '.join(loaded) or '-'}")
+        if loaded:
+            failures.append(f'{module} carregou {", ".join(loaded)} na importação')
+        if module in budget and seconds > budget[module]:
+            failures.append(f'{module} levou {seconds:.3f}s, acima de {budget[module]:.3f}s')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Gerador de modelos sintéticos do Power BI para os benchmarks: arquivos .pbit e resultados do scanner"""
+import json
+import random
+import uuid
+from io import BytesIO
+from zipfile import ZipFile, ZIP_DEFLATED
+
+M_TEMPLATES = [
+    'let\n    Fonte = Sql.Database("servidor{i}.database.windows.net", "dw{i}"),\n    Dados = Fonte{{[Schema="dbo",Item="{table}"]}}[Data]\nin\n    Dados',
+    'let\n    Fonte = Excel.Workbook(File.Contents("C:\\\\dados\\\\planilha{i}.xlsx"), null, true),\n    Dados = Fonte{{[Item="{table}",Kind="Sheet"]}}[Data]\nin\n    Dados',
+    'let\n    Fonte = OData.Feed("https://api{i}.exemplo.com/odata/{table}")\nin\n    Fonte',
+]
+DATA_TYPES = ['string', 'int64', 'double', 'dateTime', 'boolean']
+
+def split_objects(n_objects):
+    """Divide o total de objetos entre tabelas, colunas e medidas em proporções parecidas com as de modelos reais"""
+    n_tables = max(1, n_objects // 20)
+    n_measures = max(1, n_objects * 3 // 10)
+    n_columns = max(n_tables, n_objects - n_tables - n_measures)
+    n_sources = max(1, n_tables // 3)
+    return n_tables, n_columns, n_measures, n_sources
+
+def synthetic_tables(n_objects, seed=0):
+    """Tabelas no formato usado pelos dois geradores: nome, expressão M, colunas e medidas que referenciam colunas e outras medidas"""
+    n_tables, n_columns, n_measures, n_sources = split_objects(n_objects)
+    rng = random.Random(seed)
+
+    tables = []
+    for t in range(n_tables):
+        name = f'Tabela {t}'
+        source = M_TEMPLATES[(t % n_sources) % len(M_TEMPLATES)].format(i=t % n_sources, table=name)
+        tables.append({'name': name, 'source': source, 'columns': [], 'measures': []})
+
+    for c in range(n_columns):
+        tables[c % n_tables]['columns'].append({'name': f'Coluna {c}', 'dataType': rng.choice(DATA_TYPES)})
+
+    for m in range(n_measures):
+        table = tables[m % n_tables]
+        column_table = tables[rng.randrange(n_tables)]
+        column = rng.choice(column_table['columns'])['name']
+        expression = f"CALCULATE(SUM('{column_table['name']}'[{column}]), ALL('{table['name']}'))"
+        if m > 0:
+            expression = f"{expression} + [Medida {rng.randrange(m)}]"
+        table['measures'].append({'name': f'Medida {m}', 'expression': expression})
+
+    return tables
+
+def generate_pbit(n_objects, seed=0):
+    """Gera os bytes de um .pbit com as entradas Connections e DataModelSchema, no mesmo formato do Power BI Desktop"""
+    rng = random.Random(seed)
+    tables = synthetic_tables(n_objects, seed)
+
+    schema = {
+        'name': str(uuid.UUID(int=rng.getrandbits(128))),
+        'compatibilityLevel': 1550,
+        'model': {
+            'culture': 'pt-BR',
+            'tables': [
+                {
+                    'name': table['name'],
+                    'columns': [
+                        {'name': column['name'], 'dataType': column['dataType'], 'sourceColumn': column['name']}
+                        for column in table['columns']
+                    ],
+                    'measures': [
+                        {'name': measure['name'], 'expression': measure['expression']}
+                        for measure in table['measures']
+                    ],
+                    'partitions': [
+                        {'name': table['name'], 'mode': 'import', 'source': {'type': 'm', 'expression': table['source'].split('\n')}}
+                    ]
+                }
+                for table in tables
+            ],
+            'expressions': [
+                {'name': 'Servidor', 'kind': 'm', 'expression': '"servidor0.database.windows.net" meta [IsParameterQuery=true, Type="Text"]'}
+            ]
+        }
+    }
+    connections = {
+        'Version': 3,
+        'Connections': [],
+        'RemoteArtifacts': [{'DatasetId': str(uuid.UUID(int=rng.getrandbits(128))), 'ReportId': str(uuid.UUID(int=rng.getrandbits(128)))}]
+    }
+
+    buffer = BytesIO()
+    with ZipFile(buffer, 'w', ZIP_DEFLATED) as zipf:
+        zipf.writestr('Version', '1.28'.encode('utf-16-le'))
+        zipf.writestr('Connections', json.dumps(connections).encode('utf-8'))
+        zipf.writestr('DataModelSchema', json.dumps(schema).encode('utf-16-le'))
+    return buffer.getvalue()
+
+def generate_dataset(n_objects, seed=0, name=None):
+    """Gera um dataset no formato do scanResult com datasetSchema e datasetExpressions"""
+    rng = random.Random(seed)
+    tables = synthetic_tables(n_objects, seed)
+
+    return {
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'name': name or f'Relatorio sintetico {seed}',
+        'configuredBy': 'benchmark@exemplo.com',
+        'createdDate': '2024-01-01T00:00:00.000Z',
+        'contentProviderType': 'PbixInImportMode',
+        'isRefreshable': True,
+        'tables': [
+            {
+                'name': table['name'],
+                'isHidden': False,
+                'storageMode': 'Import',
+                'source': [{'expression': table['source']}],
+                'columns': [
+                    {'name': column['name'], 'dataType': column['dataType'], 'isHidden': False, 'columnType': 'Data'}
+                    for column in table['columns']
+                ],
+                'measures': [
+                    {'name': measure['name'], 'expression': measure['expression'], 'isHidden': False}
+                    for measure in table['measures']
+                ]
+            }
+            for table in tables
+        ],
+        'expressions': [
+            {'name': 'Servidor', 'expression': '"servidor0.database.windows.net" meta [IsParameterQuery=true, Type="Text"]'}
+        ]
+    }
+
+def generate_workspace(workspace_id, n_objects, n_datasets=1):
+    """Gera uma workspace do scanResult com n_datasets datasets de n_objects objetos cada"""
+    return {
+        'id': workspace_id,
+        'name': f'Workspace {workspace_id[:8]}',
+        'type': 'Workspace',
+        'state': 'Active',
+        'isOnDedicatedCapacity': False,
+        'reports': [],
+        'dashboards': [],
+        'datasets': [generate_dataset(n_objects, seed=i) for i in range(n_datasets)]
+    }
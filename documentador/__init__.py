@@ -0,0 +1,4 @@
+"""Documentador de relatórios do Power BI.
+
+Os módulos não se importam além do necessário: openai, msal, requests, docx e xlsxwriter só são carregados no
+primeiro uso, para que o app e o modo em lote abram rápido"""
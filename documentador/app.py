@@ -0,0 +1,357 @@
+"""Interface do Streamlit: entradas da barra lateral, painéis de documentação, linhagem, catálogo e diagnóstico"""
+import hashlib
+import json
+import os
+import pandas as pd
+import streamlit as st
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from io import BytesIO
+
+from documentador.auth import AuthenticationError, credential_key, get_token
+from documentador.catalog import save_to_catalog, search_expressions, search_sources
+from documentador.config import CACHE_TTL, MAX_LISTED_WORKSPACES, PBIT_CACHE_MAX_ENTRIES
+from documentador.documentation import Documenta, DocumentationStream, document_changes, prompt, save_documented_version, text_to_document
+from documentador.exporters import DocumentationExcel, export_model_excel, generate_docx
+from documentador.lineage import build_lineage
+from documentador.metrics import export_metrics, get_metrics
+from documentador.models import merge_sources, report_key
+from documentador.parsers import parse_pbit
+from documentador.scanner import get_workspaces_id, index_scan, scan_workspace, snapshot_time, workspace_filter
+
+def configure_app():
+    """Função para configurar o app"""
+    st.set_page_config(
+        page_title="Documentador de Power BI",
+        page_icon="🧊",
+        layout="wide",
+        initial_sidebar_state="expanded",
+    )
+    
+    st.header('Documentador de Power BI')
+    st.write("""Este aplicativo tem como objetivo principal facilitar a organização, o acompanhamento e a análise de dados, fornecendo uma documentação completa dos relatórios da organização. 
+    Observação: a requisição para o retorno de relatórios e workspaces pode atingir o limite máximo de 50 solicitações por hora ou 15 por minuto, sendo necessário aguardar um tempo para realizar novas solicitações.""")
+
+def sidebar_inputs():
+    """Função responsável por mostrar o menu lateral e receber os dados de administrador"""
+    with st.sidebar:
+        st.title("Documentador de Power BI")
+        st.write('Preencha com as informações do App')
+        app_id = st.text_input(label='App ID')
+        tenant_id = st.text_input(label='Tenant ID')
+        secret_value = st.text_input(label='Secret value')
+        
+        st.write('')
+
+        uploaded_files = st.file_uploader("Apenas arquivo '.pbit'", accept_multiple_files=False, type=['pbit', 'zip'], help="""Para obter o arquivo .pbit, você pode salvar o arquivo selecionando a opção para essa extensão. 
+        Ou também, em Arquivo > Exportar > Power BI Template.""")
+        
+    return app_id, tenant_id, secret_value, uploaded_files
+
+def main_content(headers=None, uploaded_files=None, credential=None):
+    """Função que mostra as informações principais do APP"""
+    if uploaded_files:
+        model = upload_file(uploaded_files)
+        if model:
+            buttons_download(model)
+    
+    if headers:
+        # Com credenciais a lista de workspaces já usa o requests; sem elas o app nem chega a importá-lo
+        import requests
+        search = st.text_input('Buscar workspace pelo nome', placeholder='Deixe em branco para listar todas')
+        include_personal = st.checkbox('Incluir workspaces pessoais')
+
+        progress = st.empty()
+        try:
+            workspace_dict = cached_workspaces(
+                credential,
+                workspace_filter(search, include_personal),
+                headers,
+                lambda loaded: progress.caption(f'{loaded} workspaces carregadas...')
+            )
+        except requests.HTTPError as error:
+            st.error(f"Erro: {error.response.status_code}")
+            workspace_dict = None
+        progress.empty()
+
+        if workspace_dict is not None and len(workspace_dict) >= MAX_LISTED_WORKSPACES:
+            st.caption(f'Mostrando as primeiras {MAX_LISTED_WORKSPACES} workspaces, refine a busca para encontrar as demais.')
+
+        if workspace_dict:
+            option = st.selectbox("Qual workspace você gostaria de visualizar?", list(workspace_dict.keys()), index=None, placeholder='Selecione a workspace...')
+            if option:
+                with st.spinner('Retornando relatório...'):
+                    workspace_id = workspace_dict[option]
+                    try:
+                        scan_response = cached_scan(credential, workspace_id, headers)
+                    except (requests.RequestException, RuntimeError, TimeoutError) as error:
+                        st.error(f"Erro ao escanear a workspace: {error}")
+                        scan_response = None
+
+                if scan_response:
+                    display_reports(scan_response, credential, workspace_id)
+
+def display_reports(scan_response, credential=None, workspace_id=None):
+    """Função responsável por mostrar os paineis e lidar com a seleção"""
+    scan_index = cached_scan_index(credential, workspace_id, scan_response)
+
+    if st.toggle("Análise de impacto das fontes da workspace"):
+        lineage_panel(cached_lineage(credential, workspace_id, scan_index), 'workspace_lineage', kinds=('fonte',))
+    
+    option = st.selectbox("Qual relatório você gostaria de visualizar?", list(scan_index.relatorios), index=None, placeholder='Selecione o relatório...')
+    
+    if option:
+        buttons_download(scan_index.get(option))
+
+def buttons_download(model):
+    """Função responsável pelos botões de visualização e download, todos lidos a partir do modelo normalizado"""
+    on = st.toggle("Mostrar tabela completa")
+
+    if on:
+        st.dataframe(model.desnormalizar())
+    
+    if st.toggle("Mostrar linhagem e análise de impacto"):
+        lineage_panel(build_lineage([model]), 'report_lineage')
+
+    differential = st.toggle("Documentar apenas o que mudou desde a última documentação", value=True)
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:   
+        # A planilha só é gerada quando o usuário pede, e fica na sessão até o relatório mudar
+        if st.button('Gerar tabela completa para Excel'):
+            with st.spinner('Gerando tabela completa para excel...'):
+                st.session_state['model_excel'] = (report_key(model), export_model_excel(model))
+
+        if st.session_state.get('model_excel', (None, None))[0] == report_key(model):
+            st.download_button(
+                label="Baixar tabela completa para Excel",
+                data=st.session_state['model_excel'][1],
+                file_name=f'modelo.xlsx',
+                mime="application/vnd.ms-excel"
+            )
+
+        if st.button('Mostrar apenas as tabelas'):
+            filtered_df = model.tabelas[model.tabelas['FonteDados'].notnull()]
+            filtered_df = filtered_df[['NomeTabela', 'FonteDados']].drop_duplicates().reset_index(drop=True)
+            st.dataframe(filtered_df)
+
+    with col2:
+        if st.button("Documentar painel para Excel"):
+            get_documentation(model, differential)
+            st.session_state['buffer'] = st.session_state['documentation_excel']
+        
+            if 'buffer' in st.session_state:
+                st.download_button(
+                    label="Baixar planilha",
+                    data=st.session_state['buffer'],
+                    file_name='painel_documentado.xlsx',
+                    mime="application/vnd.ms-excel"
+                )
+                
+        if st.button('Mostrar apenas as colunas'):
+            df = model.colunas
+            filtered_df = df[df['NomeColuna'].notnull() & df['TipoDadoColuna'].notnull() & df['ExpressaoColuna'].notnull()]
+            filtered_df = filtered_df[['NomeTabela', 'NomeColuna', 'TipoDadoColuna', 'ExpressaoColuna']].drop_duplicates().reset_index(drop=True)
+            st.dataframe(filtered_df)
+
+    with col3:
+        if st.button("Documentar painel para Word"):
+            documentation, measures_df = get_documentation(model, differential)
+            doc = generate_docx(documentation, measures_df)
+            buffer = BytesIO()
+            doc.save(buffer)
+            buffer.seek(0)
+            st.download_button(
+                label="Baixar Word",
+                data=buffer,
+                file_name='document.docx',
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            )
+
+        if st.button('Mostrar apenas as medidas'):
+            df = model.medidas
+            filtered_df = df[df['NomeMedida'].notnull() & df['ExpressaoMedida'].notnull()]
+            filtered_df = filtered_df[['NomeMedida', 'ExpressaoMedida']].drop_duplicates().reset_index(drop=True)
+            st.dataframe(filtered_df)
+
+def lineage_panel(lineage, key, kinds=None):
+    """Mostra, para o objeto escolhido, o que quebra se ele for removido e do que ele depende"""
+    nodes = sorted((node for node in lineage.nodes() if kinds is None or node.tipo in kinds), key=node_label)
+    selected = st.selectbox("Objeto", nodes, format_func=node_label, index=None, placeholder='Selecione uma tabela, coluna, medida ou fonte...', key=key)
+
+    if selected:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write('O que quebra se ele for removido')
+            st.dataframe(nodes_frame(lineage.impact(selected)))
+        with col2:
+            st.write('Do que ele depende')
+            st.dataframe(nodes_frame(lineage.upstream(selected)))
+
+def node_label(node):
+    if node.tipo == 'coluna':
+        return f"coluna: {node.tabela}[{node.nome}]"
+    if node.tipo == 'medida':
+        return f"medida: [{node.nome}]"
+    if node.tipo == 'fonte':
+        return f"fonte: {node.tabela}({node.nome})" + (f" no dataset {node.dataset}" if node.dataset else '')
+    return f"{node.tipo}: {node.nome}"
+
+def nodes_frame(nodes):
+    return pd.DataFrame(sorted(nodes, key=node_label), columns=['Tipo', 'Dataset', 'Tabela', 'Nome'])
+
+def get_documentation(model, differential=True):
+    """Gera a documentação uma única vez por modelo na sessão, para que exportar Excel e Word não documente o painel duas vezes.
+    As descrições aparecem na tela conforme o LLM as escreve, e a planilha é montada com os mesmos itens, ficando pronta
+    junto com a documentação"""
+    sections, measures_df = text_to_document(model)
+    documentation_key = hashlib.sha256(json.dumps([sections, differential], sort_keys=True).encode('utf-8')).hexdigest()
+
+    if st.session_state.get('documentation_key') != documentation_key:
+        if differential:
+            stream = DocumentationStream(document_changes, prompt(), sections, report_key(model))
+        else:
+            stream = DocumentationStream(Documenta, prompt(), sections)
+
+        excel = DocumentationExcel(measures_df)
+        render_documentation_stream(stream, excel)
+        if not differential:
+            save_documented_version(report_key(model), sections, stream.documentation)
+
+        st.session_state['documentation'] = stream.documentation
+        st.session_state['documentation_excel'] = excel.close(stream.documentation.alteracoes).getvalue()
+        st.session_state['documentation_key'] = documentation_key
+
+    return st.session_state['documentation'], measures_df
+
+def render_documentation_stream(stream, excel, interval=0.3):
+    """Mostra as descrições conforme chegam, redesenhando cada seção no máximo a cada interval segundos"""
+    titles = {'Relatorio': 'Relatório', 'Tabelas_do_Relatorio': 'Tabelas', 'Medidas_do_Relatorio': 'Medidas', 'Fontes_de_Dados': 'Fontes de dados'}
+    status = st.empty()
+    placeholders = {section: st.empty() for section in titles}
+    received = defaultdict(dict)
+    drawn_at = 0.0
+
+    def draw():
+        for section, items in received.items():
+            with placeholders[section].container():
+                st.caption(titles[section])
+                if section == 'Relatorio':
+                    st.json(items.get('Relatorio', {}))
+                else:
+                    st.dataframe(pd.DataFrame(list(items.values())), use_container_width=True)
+        status.info(f"Documentando painel... {sum(len(items) for section, items in received.items() if section != 'Relatorio')} itens prontos")
+
+    status.info('Documentando painel...')
+    for section, item in stream:
+        excel.add(section, item)
+        key = 'Relatorio' if section == 'Relatorio' else item.get('Nome', len(received[section]))
+        if section == 'Fontes_de_Dados' and key in received[section]:
+            received[section][key] = merge_sources([received[section][key]], [item], set())[0]
+        else:
+            received[section].setdefault(key, item)
+        if time.monotonic() - drawn_at >= interval:
+            draw()
+            drawn_at = time.monotonic()
+
+    draw()
+    status.empty()
+
+def main():
+    """Função principal do app, onde tudo será apresentado"""
+    configure_app()
+
+    app_id, tenant_id, secret_value, uploaded_files = sidebar_inputs()
+    
+    if app_id and tenant_id and secret_value:
+        try:
+            headers = get_token(app_id, tenant_id, secret_value)
+        except AuthenticationError as error:
+            st.error(f"Erro ao autenticar: {error}")
+        else:
+            main_content(headers, None, credential_key(app_id, tenant_id, secret_value))
+    
+    if uploaded_files:
+        main_content(None, uploaded_files)
+
+    catalog_search()
+    diagnostics_panel()
+    export_metrics()
+        
+            
+def diagnostics_panel():
+    """Tempos por etapa, uso da API do Power BI e tokens do LLM acumulados desde o início do processo"""
+    metrics = get_metrics()
+    with st.expander("Diagnóstico"):
+        st.write('Tempo por etapa')
+        st.dataframe(metrics.stages())
+        st.write('Requisições, cotas e tokens')
+        st.dataframe(metrics.values())
+        st.download_button('Baixar métricas (Prometheus)', metrics.prometheus(), file_name='documentador.prom', mime='text/plain')
+
+def upload_file(uploaded_files):
+    """Processa o upload do arquivo .pbit ou .zip e extrai os dados relevantes."""
+    if uploaded_files.name.endswith('.pbit') or uploaded_files.name.endswith('.zip'):
+        report_name = os.path.splitext(uploaded_files.name)[0]
+        return cached_pbit(uploaded_files.getvalue(), report_name)
+    else:
+        st.write('Arquivo não suportado')
+
+@st.cache_resource
+def get_workspaces_cache():
+    return {}
+
+def cached_workspaces(credential, filter, headers, on_progress=None):
+    """Listagem de workspaces em cache por credencial e filtro. Não usa st.cache_data porque o progresso é mostrado
+    em um elemento criado fora da função, o que o cache_data não consegue repetir"""
+    cache = get_workspaces_cache()
+    now = time.time()
+    cached = cache.get((credential, filter))
+    if cached and cached[0] > now:
+        return cached[1]
+
+    workspace_dict = get_workspaces_id(headers, filter, on_progress=on_progress)
+    for key in [key for key, (expires_at, _) in cache.items() if expires_at <= now]:
+        cache.pop(key, None)
+    cache[(credential, filter)] = (now + CACHE_TTL, workspace_dict)
+    return workspace_dict
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner=False)
+def cached_scan(credential, workspace_id, _headers):
+    """Resultado do scan em cache por credencial e workspace. Usa cache_resource para não copiar o JSON a cada execução"""
+    return scan_workspace(_headers, workspace_id)
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner=False)
+def cached_scan_index(credential, workspace_id, _scan_response):
+    """Índice do scan montado uma vez por credencial e workspace, evitando refazer a limpeza do JSON a cada interação.
+    Os datasets também são gravados no catálogo local"""
+    scan_index = index_scan(_scan_response)
+    scanned_at = snapshot_time(workspace_id) or datetime.now(timezone.utc)
+    for model in scan_index.modelos.values():
+        save_to_catalog(model, 'scanner', workspace_id, scanned_at)
+    return scan_index
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner=False)
+def cached_lineage(credential, workspace_id, _scan_index):
+    """Grafo de linhagem de todos os datasets da workspace, montado uma vez"""
+    return build_lineage(_scan_index.modelos.values())
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=PBIT_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_pbit(content, report_name):
+    """Modelo do .pbit em cache pelo conteúdo do arquivo, gravado também no catálogo local"""
+    model = parse_pbit(BytesIO(content), report_name)
+    save_to_catalog(model, 'pbit')
+    return model
+
+def catalog_search():
+    """Busca no catálogo local, sem novos scans e sem gastar a cota da API"""
+    with st.expander("Buscar no catálogo"):
+        mode = st.radio("Buscar em", ['Expressões DAX e M', 'Fontes de dados'], horizontal=True)
+        text = st.text_input("Termos da busca", placeholder='Ex.: CALCULATE Vendas ou servidor.database.windows.net')
+        if text.strip():
+            if mode == 'Fontes de dados':
+                st.dataframe(search_sources(text))
+            else:
+                st.dataframe(search_expressions(text))
@@ -0,0 +1,54 @@
+"""Autenticação no Azure AD com as credenciais do App, com o token em cache até perto de expirar"""
+import hashlib
+import threading
+import time
+from functools import lru_cache
+
+from documentador.config import TOKEN_REFRESH_MARGIN
+from documentador.metrics import get_metrics
+
+class AuthenticationError(Exception):
+    """O Azure AD recusou as credenciais do App"""
+
+def get_token(APP_ID, TENANT_ID, SECRET_VALUE):
+    """Função para pegar o token do cliente da Microsoft. O token fica em cache por credencial e só é
+    renovado quando estiver perto de expirar. Levanta AuthenticationError se as credenciais forem recusadas"""
+    cache_key = credential_key(APP_ID, TENANT_ID, SECRET_VALUE)
+    token_cache = get_token_cache()
+
+    with token_cache['lock']:
+        cached = token_cache['tokens'].get(cache_key)
+        if cached is None or cached['expires_at'] - TOKEN_REFRESH_MARGIN <= time.time():
+            scopes = ["https://analysis.windows.net/powerbi/api/.default"]
+            with get_metrics().span('msal_token'):
+                result = get_msal_app(APP_ID, TENANT_ID, SECRET_VALUE).acquire_token_for_client(scopes=scopes)
+            if 'access_token' not in result:
+                raise AuthenticationError(result.get('error_description', result.get('error')))
+
+            cached = {'access_token': result['access_token'], 'expires_at': time.time() + int(result.get('expires_in', 3600))}
+            token_cache['tokens'][cache_key] = cached
+
+    headers = {
+        'Authorization': f"Bearer {cached['access_token']}",
+        "Content-Type": "application/json",
+    }
+
+    return headers
+
+def credential_key(app_id, tenant_id, secret_value):
+    """Identifica a credencial nos caches sem guardar o segredo em texto"""
+    return hashlib.sha256(f'{app_id}|{tenant_id}|{secret_value}'.encode('utf-8')).hexdigest()
+
+# O Streamlit executa de novo apenas o main.py a cada interação; os módulos do pacote são importados uma vez por processo,
+# então os tokens, o cliente MSAL, a sessão HTTP e os limitadores sobrevivem entre as execuções em variáveis do módulo
+TOKEN_CACHE = {'lock': threading.Lock(), 'tokens': {}}
+
+def get_token_cache():
+    return TOKEN_CACHE
+
+@lru_cache(maxsize=32)
+def get_msal_app(app_id, tenant_id, secret_value):
+    """Cliente MSAL reaproveitado entre as execuções do Streamlit. O msal só é importado no primeiro login"""
+    import msal
+    authority = f"https://login.microsoftonline.com/{tenant_id}"
+    return msal.ConfidentialClientApplication(app_id, authority=authority, client_credential=secret_value)
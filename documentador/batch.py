@@ -0,0 +1,231 @@
+"""Documentação em lote, sem a interface do Streamlit, de uma pasta de arquivos .pbit ou de uma lista de workspaces.
+
+Uso:
+    python -m documentador.batch --pbit-dir relatorios/ --saida documentacoes/
+    python -m documentador.batch --workspaces <id> <id> --saida documentacoes/
+
+No modo de workspaces as credenciais do App vêm das variáveis APP_ID, TENANT_ID e SECRET_VALUE (ou do .env).
+O progresso é gravado no arquivo de job (padrão: <saida>/job.json) a cada relatório. Rodar o mesmo comando de novo
+retoma de onde parou: relatórios já concluídos e que não mudaram são pulados."""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from io import BytesIO
+
+from documentador.auth import AuthenticationError, get_token
+from documentador.catalog import save_to_catalog
+from documentador.documentation import Documenta, document_changes, prompt, save_documented_version, text_to_document
+from documentador.exporters import generate_docx, generate_excel
+from documentador.metrics import export_metrics, get_metrics
+from documentador.models import report_key
+from documentador.parsers import parse_pbit
+from documentador.scanner import index_scan, scan_workspaces_incremental, snapshot_time
+
+logger = logging.getLogger('documentador.batch')
+
+class JobFile:
+    """Estado do job em JSON, regravado de forma atômica (arquivo temporário + os.replace) a cada atualização,
+    para que uma queda no meio da escrita não corrompa o progresso já salvo"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as file:
+                self.state = json.load(file)
+        except FileNotFoundError:
+            self.state = {'relatorios': {}}
+
+    def done(self, key, content_hash):
+        """O relatório já foi documentado nesta versão"""
+        entry = self.state['relatorios'].get(key)
+        return entry is not None and entry['status'] == 'concluido' and entry['hash'] == content_hash
+
+    def update(self, key, **values):
+        with self.lock:
+            entry = self.state['relatorios'].setdefault(key, {})
+            entry.update(values, atualizado_em=datetime.now(timezone.utc).isoformat())
+            self.save()
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, suffix='.tmp', delete=False) as file:
+            json.dump(self.state, file, ensure_ascii=False, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(file.name, self.path)
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def sections_hash(model):
+    """Hash do que é enviado ao LLM, para saber se um dataset do scan mudou desde a última execução"""
+    sections, _ = text_to_document(model)
+    return hashlib.sha256(json.dumps(sections, sort_keys=True).encode('utf-8')).hexdigest()
+
+def parse_file(path):
+    """Lê e interpreta um .pbit. Roda em um processo separado, já que a leitura do DataModelSchema é presa à CPU"""
+    with open(path, 'rb') as file:
+        content = file.read()
+    return parse_pbit(BytesIO(content), os.path.splitext(os.path.basename(path))[0])
+
+def output_name(name):
+    """Nome de arquivo seguro a partir do nome do relatório"""
+    return re.sub(r'[^\w\-. ]+', '_', name).strip() or 'relatorio'
+
+def output_base(output_dir, key):
+    """Caminho dos arquivos gerados, sem a extensão, a partir da chave do job: o caminho relativo do .pbit ou
+    workspace/dataset no scan. Relatórios com o mesmo nome em pastas ou workspaces diferentes não se sobrescrevem"""
+    parts = [part for part in re.split(r'[\\/]', re.sub(r'\.pbit$', '', key, flags=re.I)) if part not in ('', '.', '..')]
+    return os.path.join(output_dir, *[output_name(part) for part in parts or ['relatorio']])
+
+def document_model(key, model, output_dir, formats, differential):
+    """Documenta um relatório e grava os arquivos pedidos, devolvendo os caminhos gerados"""
+    sections, measures_df = text_to_document(model)
+    if differential:
+        documentation = document_changes(prompt(), sections, key)
+    else:
+        documentation = Documenta(prompt(), sections)
+        save_documented_version(key, sections, documentation)
+
+    base = output_base(output_dir, key)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    outputs = []
+    for extension in formats:
+        path = f'{base}.{extension}'
+        WRITERS[extension](path, documentation, measures_df)
+        outputs.append(path)
+    return outputs
+
+def write_excel(path, documentation, measures_df):
+    with open(path, 'wb') as file:
+        file.write(generate_excel(documentation, measures_df).getvalue())
+
+def write_docx(path, documentation, measures_df):
+    generate_docx(documentation, measures_df).save(path)
+
+WRITERS = {'xlsx': write_excel, 'docx': write_docx}
+
+def pbit_jobs(pbit_dir, job, processes):
+    """Gera (chave, hash, modelo) dos .pbit da pasta que ainda não foram documentados, interpretados em um pool de processos"""
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(pbit_dir)
+        for name in names if name.lower().endswith(('.pbit', '.zip'))
+    )
+
+    pending = {}
+    for path in paths:
+        key = os.path.relpath(path, pbit_dir)
+        content_hash = file_hash(path)
+        if job.done(key, content_hash):
+            logger.info('Pulando %s, já documentado', key)
+            continue
+        pending[key] = (path, content_hash)
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(parse_file, path): key for key, (path, _) in pending.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            content_hash = pending[key][1]
+            try:
+                model = future.result()
+            except Exception as error:
+                logger.exception('Erro ao ler %s', key)
+                job.update(key, status='erro', hash=content_hash, erro=str(error))
+                continue
+            save_to_catalog(model, 'pbit')
+            yield key, content_hash, model
+
+def workspace_jobs(workspace_ids, job):
+    """Gera (chave, hash, modelo) dos relatórios das workspaces que mudaram desde a última execução"""
+    try:
+        headers = get_token(os.getenv('APP_ID'), os.getenv('TENANT_ID'), os.getenv('SECRET_VALUE'))
+    except AuthenticationError as error:
+        raise SystemExit(f'Não foi possível autenticar com APP_ID, TENANT_ID e SECRET_VALUE: {error}')
+
+    scans = scan_workspaces_incremental(headers, workspace_ids)
+    for workspace_id in workspace_ids:
+        scan_response = scans.get(workspace_id)
+        if scan_response is None:
+            logger.error('Scan da workspace %s não retornou resultado', workspace_id)
+            continue
+
+        scan_index = index_scan(scan_response)
+        scanned_at = snapshot_time(workspace_id)
+        for model in scan_index.modelos.values():
+            save_to_catalog(model, 'scanner', workspace_id, scanned_at)
+
+        for name in scan_index.relatorios:
+            model = scan_index.get(name)
+            key = f'{workspace_id}/{report_key(model)}'
+            content_hash = sections_hash(model)
+            if job.done(key, content_hash):
+                logger.info('Pulando %s, sem alterações', name)
+                continue
+            yield key, content_hash, model
+
+def run(jobs, job, output_dir, formats, differential, workers):
+    """Documenta os relatórios conforme ficam prontos, até workers ao mesmo tempo. As chamadas ao LLM de todos eles
+    dividem o mesmo limite, LLM_MAX_CONCURRENCY"""
+    os.makedirs(output_dir, exist_ok=True)
+    failures = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for key, content_hash, model in jobs:
+            job.update(key, status='em_andamento', hash=content_hash, relatorio=model.nome)
+            futures[pool.submit(document_model, key, model, output_dir, formats, differential)] = (key, content_hash)
+
+        for future in as_completed(futures):
+            key, content_hash = futures[future]
+            try:
+                outputs = future.result()
+            except Exception as error:
+                logger.exception('Erro ao documentar %s', key)
+                job.update(key, status='erro', hash=content_hash, erro=str(error))
+                failures += 1
+                continue
+            job.update(key, status='concluido', hash=content_hash, saidas=outputs, erro=None)
+            logger.info('Documentado %s', key)
+
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Documenta relatórios do Power BI em lote')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pbit-dir', help='Pasta com arquivos .pbit, lida recursivamente')
+    source.add_argument('--workspaces', nargs='+', help='Ids das workspaces a escanear')
+    parser.add_argument('--saida', default='documentacoes', help='Pasta onde ficam os arquivos gerados')
+    parser.add_argument('--job', help='Arquivo de progresso do job (padrão: <saida>/job.json)')
+    parser.add_argument('--formatos', nargs='+', choices=['xlsx', 'docx'], default=['xlsx', 'docx'])
+    parser.add_argument('--processos', type=int, default=os.cpu_count(), help='Processos para ler os .pbit')
+    parser.add_argument('--relatorios-simultaneos', type=int, default=4, help='Relatórios documentados ao mesmo tempo')
+    parser.add_argument('--completo', action='store_true', help='Documenta tudo de novo, sem reaproveitar a última versão')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    job = JobFile(args.job or os.path.join(args.saida, 'job.json'))
+
+    if args.pbit_dir:
+        jobs = pbit_jobs(args.pbit_dir, job, args.processos)
+    else:
+        jobs = workspace_jobs(args.workspaces, job)
+
+    failures = run(jobs, job, args.saida, args.formatos, not args.completo, args.relatorios_simultaneos)
+    export_metrics()
+    logger.info('Tempo por etapa:\n%s', get_metrics().stages().to_string(index=False))
+    if failures:
+        raise SystemExit(f'{failures} relatório(s) com erro, veja {job.path}')
+
+if __name__ == '__main__':
+    main()
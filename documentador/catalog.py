@@ -0,0 +1,106 @@
+"""Catálogo local em SQLite com os metadados dos datasets e busca textual (FTS5) nas expressões DAX e M"""
+import os
+import pandas as pd
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+
+from documentador.config import CATALOG_PATH
+from documentador.metrics import timed
+from documentador.models import dataframe_rows, report_key
+from documentador.parsers import m_parameters, m_sources
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (dataset_id TEXT PRIMARY KEY, nome TEXT, workspace_id TEXT, origem TEXT, escaneado_em TEXT);
+CREATE TABLE IF NOT EXISTS tabelas (dataset_id TEXT, nome_tabela TEXT, modo_armazenamento TEXT, fonte_dados TEXT);
+CREATE TABLE IF NOT EXISTS colunas (dataset_id TEXT, nome_tabela TEXT, nome_coluna TEXT, tipo_dado TEXT, tipo_coluna TEXT, expressao TEXT);
+CREATE TABLE IF NOT EXISTS medidas (dataset_id TEXT, nome_tabela TEXT, nome_medida TEXT, expressao TEXT);
+CREATE TABLE IF NOT EXISTS fontes (dataset_id TEXT, nome_tabela TEXT, conector TEXT, argumentos TEXT);
+CREATE INDEX IF NOT EXISTS tabelas_dataset ON tabelas (dataset_id);
+CREATE INDEX IF NOT EXISTS colunas_dataset ON colunas (dataset_id);
+CREATE INDEX IF NOT EXISTS medidas_dataset ON medidas (dataset_id);
+CREATE INDEX IF NOT EXISTS fontes_dataset ON fontes (dataset_id);
+CREATE INDEX IF NOT EXISTS fontes_argumentos ON fontes (conector, argumentos);
+CREATE VIRTUAL TABLE IF NOT EXISTS expressoes_fts USING fts5(
+    dataset_id UNINDEXED, tipo UNINDEXED, nome_tabela, nome, expressao, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+def catalog_connection():
+    """Abre o catálogo, criando as tabelas na primeira vez. Cada chamada usa a própria conexão, então pode ser usada em várias threads"""
+    os.makedirs(os.path.dirname(CATALOG_PATH) or '.', exist_ok=True)
+    connection = sqlite3.connect(CATALOG_PATH, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(CATALOG_SCHEMA)
+    return connection
+
+@timed('save_to_catalog')
+def save_to_catalog(model, origin, workspace_id=None, scanned_at=None):
+    """Substitui no catálogo tudo o que se sabe do dataset pelo conteúdo do modelo, em uma única transação"""
+    dataset_id = report_key(model)
+    scanned_at = (scanned_at or datetime.now(timezone.utc)).isoformat()
+    tables = model.tabelas.reindex(columns=['NomeTabela', 'storageMode', 'FonteDados'])
+
+    table_rows = [(dataset_id, *row) for row in dataframe_rows(tables)]
+    column_rows = [(dataset_id, *row) for row in dataframe_rows(model.colunas[['NomeTabela', 'NomeColuna', 'TipoDadoColuna', 'TipoColuna', 'ExpressaoColuna']])]
+    measure_rows = [(dataset_id, *row) for row in dataframe_rows(model.medidas[['NomeTabela', 'NomeMedida', 'ExpressaoMedida']])]
+
+    # Servidores e bancos vindos de parâmetros são gravados com o valor do parâmetro, para que a busca por fonte os encontre
+    parameters = m_parameters(zip(model.expressoes['NomeExpressao'], model.expressoes['ExpressaoM']))
+    source_rows, text_rows = [], []
+    for _, table_name, _, source in table_rows:
+        if isinstance(source, str):
+            source_rows += [(dataset_id, table_name, connector, ', '.join(arguments)) for connector, arguments in m_sources(source, parameters)]
+            text_rows.append((dataset_id, 'M', table_name, table_name, source))
+    for name, expression in dataframe_rows(model.expressoes):
+        if isinstance(expression, str):
+            source_rows += [(dataset_id, None, connector, ', '.join(arguments)) for connector, arguments in m_sources(expression, parameters)]
+            text_rows.append((dataset_id, 'M', None, name, expression))
+    text_rows += [(dataset_id, 'DAX', table_name, name, expression) for _, table_name, name, expression in measure_rows if isinstance(expression, str)]
+    text_rows += [(dataset_id, 'DAX', row[1], row[2], row[5]) for row in column_rows if isinstance(row[5], str) and row[5] != 'N/A']
+
+    with closing(catalog_connection()) as connection, connection:
+        for table in ('tabelas', 'colunas', 'medidas', 'fontes', 'expressoes_fts'):
+            connection.execute(f'DELETE FROM {table} WHERE dataset_id = ?', (dataset_id,))
+        connection.execute('INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?)', (dataset_id, model.nome, workspace_id, origin, scanned_at))
+        connection.executemany('INSERT INTO tabelas VALUES (?, ?, ?, ?)', table_rows)
+        connection.executemany('INSERT INTO colunas VALUES (?, ?, ?, ?, ?, ?)', column_rows)
+        connection.executemany('INSERT INTO medidas VALUES (?, ?, ?, ?)', measure_rows)
+        connection.executemany('INSERT INTO fontes VALUES (?, ?, ?, ?)', source_rows)
+        connection.executemany('INSERT INTO expressoes_fts VALUES (?, ?, ?, ?, ?)', text_rows)
+
+def fts_query(text):
+    """Transforma o texto digitado em uma busca do FTS5 com todos os termos, sem depender da sintaxe do FTS"""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+def search_expressions(text, kind=None, limit=100):
+    """Busca textual nas expressões DAX e M do catálogo, por exemplo "CALCULATE Vendas", ordenada por relevância"""
+    columns = ['Relatorio', 'Tipo', 'Tabela', 'Nome', 'Expressao', 'EscaneadoEm']
+    if not text.split():
+        # Um MATCH vazio é erro de sintaxe no FTS5
+        return pd.DataFrame(columns=columns)
+    query = """
+        SELECT d.nome AS Relatorio, f.tipo AS Tipo, f.nome_tabela AS Tabela, f.nome AS Nome, f.expressao AS Expressao, d.escaneado_em AS EscaneadoEm
+        FROM expressoes_fts f JOIN datasets d ON d.dataset_id = f.dataset_id
+        WHERE expressoes_fts MATCH ? AND (? IS NULL OR f.tipo = ?)
+        ORDER BY bm25(expressoes_fts) LIMIT ?
+    """
+    with closing(catalog_connection()) as connection:
+        return pd.read_sql_query(query, connection, params=(fts_query(text), kind, kind, limit))
+
+def search_sources(text, limit=100):
+    """Relatórios que leem de uma fonte, buscando pelo servidor, banco, arquivo ou URL nos argumentos do conector.
+    % e _ no texto são literais, como em nomes de servidor"""
+    columns = ['Relatorio', 'Workspace', 'Tabela', 'Conector', 'Argumentos', 'EscaneadoEm']
+    if not text.strip():
+        return pd.DataFrame(columns=columns)
+    query = """
+        SELECT DISTINCT d.nome AS Relatorio, d.workspace_id AS Workspace, f.nome_tabela AS Tabela, f.conector AS Conector, f.argumentos AS Argumentos, d.escaneado_em AS EscaneadoEm
+        FROM fontes f JOIN datasets d ON d.dataset_id = f.dataset_id
+        WHERE f.argumentos LIKE ? ESCAPE '\\' OR f.conector LIKE ? ESCAPE '\\'
+        ORDER BY d.nome LIMIT ?
+    """
+    pattern = '%' + re.sub(r'([\\%_])', r'\\\1', text.strip()) + '%'
+    with closing(catalog_connection()) as connection:
+        return pd.read_sql_query(query, connection, params=(pattern, pattern, limit))
@@ -0,0 +1,66 @@
+"""Configuração do documentador, lida das variáveis de ambiente (e do .env) uma única vez, na importação"""
+import os
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_KEY = os.getenv('API_KEY')
+LLM_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o')
+# Deve ser incrementada sempre que o prompt() ou as instruções do Documenta mudarem, para invalidar o cache
+PROMPT_VERSION = '4'
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', os.path.join('.cache', 'llm'))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+LLM_CACHE_MAX_AGE = timedelta(days=int(os.getenv('LLM_CACHE_MAX_AGE_DAYS', 30)))
+# Intervalo entre as varreduras completas do cache; entre elas o tamanho é somado a cada gravação
+LLM_CACHE_EVICT_INTERVAL = int(os.getenv('LLM_CACHE_EVICT_INTERVAL', 600))
+# Orçamento de tokens de cada chamada ao LLM. As medidas, tabelas e fontes são divididas em lotes que caibam na entrada
+# e cuja resposta, estimada em LLM_TOKENS_PER_ITEM por item, caiba no max_tokens
+LLM_MAX_INPUT_TOKENS = int(os.getenv('LLM_MAX_INPUT_TOKENS', 16000))
+LLM_MAX_OUTPUT_TOKENS = 4096
+LLM_TOKENS_PER_ITEM = 120
+LLM_MAX_WORKERS = int(os.getenv('LLM_MAX_WORKERS', 8))
+# Expressões M maiores que isso vão ao prompt resumidas nas fontes, consultas e transformações que usam
+M_SUMMARY_MIN_CHARS = 300
+# Valores repetidos em um lote, a partir desse tamanho, vão uma única vez numa legenda e as linhas citam um apelido
+INTERN_MIN_CHARS = 40
+# Limite de chamadas simultâneas ao LLM somando todos os relatórios em documentação no processo
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', LLM_MAX_WORKERS))
+# Última versão documentada de cada relatório, usada na re-documentação diferencial
+DOCUMENTATION_DIR = os.getenv('DOCUMENTATION_DIR', os.path.join('.cache', 'documentacoes'))
+POWERBI_API_URL = os.getenv('POWERBI_API_URL', 'https://api.powerbi.com/v1.0/myorg')
+
+# Limite documentado de workspaces por chamada do workspaces/getInfo
+MAX_WORKSPACES_PER_SCAN = 100
+# Tamanho dos pedaços ao baixar o scanResult e ao copiar snapshots
+SCAN_CHUNK_BYTES = 1024 * 1024
+# O workspaces/modified só aceita modifiedSince dos últimos 30 dias
+MAX_MODIFIED_SINCE = timedelta(days=30)
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join('.cache', 'snapshots'))
+
+# Cotas documentadas da API de administração do Power BI, em (requisições, janela em segundos).
+# Endpoints não listados usam a cota padrão de 15 por minuto e 50 por hora
+API_QUOTAS = {
+    'default': [(15, 60), (50, 3600)],
+    'admin/groups': [(15, 60), (50, 3600)],
+    'admin/workspaces/modified': [(30, 3600)],
+    'admin/workspaces/getInfo': [(500, 3600)],
+    'admin/workspaces/scanStatus': [(10000, 3600)],
+    'admin/workspaces/scanResult': [(500, 3600)],
+}
+# Maior $top aceito pelo admin/groups e quantidade máxima de workspaces exibidas no seletor
+WORKSPACES_PAGE_SIZE = 5000
+MAX_LISTED_WORKSPACES = 1000
+# Renova o token quando faltarem menos de 5 minutos para expirar
+TOKEN_REFRESH_MARGIN = 300
+# Destinos opcionais das métricas: cada etapa e chamada ao LLM vira uma linha no JSONL, e o estado atual dos contadores
+# é regravado no textfile do Prometheus (para o textfile collector do node_exporter) ao fim de cada execução
+METRICS_JSONL = os.getenv('METRICS_JSONL')
+METRICS_PROM_PATH = os.getenv('METRICS_PROM_PATH')
+# Catálogo local com os metadados de todos os datasets já escaneados ou enviados
+CATALOG_PATH = os.getenv('CATALOG_PATH', os.path.join('.cache', 'catalogo.sqlite'))
+# Tempo, em segundos, que listagens, scans e modelos ficam em cache entre as execuções do Streamlit
+CACHE_TTL = int(os.getenv('CACHE_TTL', 900))
+# Quantidade máxima de arquivos .pbit mantidos em cache; cada entrada guarda o arquivo e o modelo extraído
+PBIT_CACHE_MAX_ENTRIES = int(os.getenv('PBIT_CACHE_MAX_ENTRIES', 20))
@@ -0,0 +1,623 @@
+"""Documentação dos relatórios pelo LLM: montagem do prompt, cache das respostas, lotes em paralelo, stream e
+re-documentação diferencial"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from documentador.config import API_KEY, DOCUMENTATION_DIR, INTERN_MIN_CHARS, LLM_CACHE_DIR, LLM_CACHE_EVICT_INTERVAL, LLM_CACHE_MAX_AGE, LLM_CACHE_MAX_BYTES, LLM_MAX_CONCURRENCY, LLM_MAX_INPUT_TOKENS, LLM_MAX_OUTPUT_TOKENS, LLM_MAX_WORKERS, LLM_MODEL, LLM_TOKENS_PER_ITEM, PROMPT_VERSION
+from documentador.metrics import get_metrics, timed
+from documentador.models import Documentation, documentation_items, merge_sources
+from documentador.parsers import compact_dax, compact_m
+
+# Instrução enviada para cada seção da documentação, todas geradas em paralelo
+DOCUMENTATION_SECTIONS = {
+    'Relatorio': "Para essa solicitação você deverá apenas retornar a parte do json 'Relatorio'",
+    'Tabelas_do_Relatorio': "Para essa solicitação você deverá apenas retornar a parte do json 'Tabelas_do_Relatorio'",
+    'Medidas_do_Relatorio': "Para essa solicitação você deverá apenas retornar a parte do json 'Medidas_do_Relatorio'. Se a medida for NaN, não retorne ela.",
+    'Fontes_de_Dados': "Para essa solicitação você deverá apenas retornar a parte do json 'Fontes_de_Dados'",
+}
+
+@timed('text_to_document')
+def text_to_document(model):
+    """Dados que serão inseridos no prompt do bot, separados por seção. Cada seção tem um cabeçalho e uma lista de itens
+    (nome, linha), uma linha por tabela, medida ou fonte, para que possam ser divididos em lotes e comparados entre versões"""    
+    tables_df = model.tabelas[model.tabelas['FonteDados'].notnull()]
+    # A ordenação deixa o texto igual para o mesmo modelo, independente da ordem de origem, o que permite reaproveitar o cache do LLM
+    tables_df = tables_df[['NomeTabela', 'FonteDados']].drop_duplicates().sort_values('NomeTabela').reset_index(drop=True)
+    
+    measures_df = model.medidas[model.medidas['NomeMedida'].notnull() & model.medidas['ExpressaoMedida'].notnull()]
+    measures_df = measures_df[['NomeMedida', 'ExpressaoMedida']].drop_duplicates().sort_values('NomeMedida').reset_index(drop=True)
+    
+    # As linhas levam as expressões compactadas; o measures_df devolvido mantém as originais para os exportadores
+    query_names = set(model.tabelas['NomeTabela'].dropna()) | set(model.expressoes['NomeExpressao'].dropna())
+    report = f"Relatório: {model.nome}"
+    source_items = [(row.NomeTabela, f"{row.NomeTabela} | {compact_m(row.FonteDados, query_names)}") for row in tables_df.itertuples(index=False)]
+    measure_items = [(row.NomeMedida, f"{row.NomeMedida} | {compact_dax(row.ExpressaoMedida)}") for row in measures_df.itertuples(index=False)]
+    name_items = [(name, f"T {name}") for name in tables_df['NomeTabela']] + [(name, f"M {name}") for name in measures_df['NomeMedida']]
+
+    sections = {
+        'Relatorio': (f"{report}\n\nTabelas (T) e medidas (M):", name_items),
+        'Tabelas_do_Relatorio': (f"{report}\n\nTabelas (Nome | Fonte dos dados):", source_items),
+        'Medidas_do_Relatorio': (f"{report}\n\nMedidas (Nome | Expressão DAX):", measure_items),
+        'Fontes_de_Dados': (f"{report}\n\nFontes dos dados das tabelas (Tabela | Expressão M):", source_items),
+    }
+        
+    return sections, measures_df
+
+def prompt():
+    prompt_relatorio = """
+    Você é um documentador especializado em Power BI. Sua função é criar documentações claras e detalhadas para os relatórios, tabelas, medidas e fontes de dados em Power BI. Para cada item, você deve incluir uma descrição compreensiva que ajude os usuários a entenderem sua finalidade e uso no contexto do relatório. Utilize uma linguagem técnica e precisa, mas acessível para usuários com diferentes níveis de conhecimento em Power BI.
+    Fazer a documentação em JSON.
+    Você deverá dividir em diferentes outupt de acordo com a entrada do usuário, separando em: info_paineis, tabelas, medidas e fonte_de_dados.
+    Para a parte de medidas, você deverá fazer em blocos, das que estiverem sendo solicitadas, mas como continuação do JSON e ao final de todas fechar o JSON igual no exemplo.
+    Retorne apenas o json, sem o ```json no inicio e o ``` no final
+
+    Instruções Específicas:
+
+    Relatórios:
+    - Título do Relatório
+    - Descrição do objetivo do relatório
+    - Principais KPIs e métricas apresentadas
+    - Público-alvo do relatório
+    - Exemplos de uso
+
+    Formato de Documentação:
+
+    Tabelas do Relatório
+    Nome da Tabela | Descrição da Tabela
+
+    Medidas do Relatório
+    Nome da Medida | Descrição da Medida
+
+    Fontes de Dados
+    Nome da Fonte de Dados | Descrição da Fonte | Tabelas Contidas no M
+
+    Exemplo de Documentação:
+
+    {
+    "Relatorio": {
+        "Titulo": "Análise de Vendas Mensais",
+        "Descricao": "Este relatório fornece uma visão detalhada das vendas mensais por região e produto. Os principais KPIs incluem receita total, unidades vendidas e margem de lucro. O relatório é destinado aos gerentes de vendas regionais e é atualizado semanalmente para refletir os dados mais recentes.",
+        "Principais_KPIs_e_Metricas": [
+        "Receita Total",
+        "Unidades Vendidas",
+        "Margem de Lucro"
+        ],
+        "Publico_Alvo": "Gerentes de Vendas Regionais",
+        "Exemplos_de_Uso": [
+        "Identificação de tendências de vendas por região",
+        "Comparação de desempenho de produtos"
+        ]
+    },
+    "Tabelas_do_Relatorio": [
+        {
+        "Nome": "Vendas",
+        "Descricao": "Tabela que armazena dados de vendas, incluindo ID do produto, quantidade vendida, preço e data da venda."
+        },
+        {
+        "Nome": "Produtos",
+        "Descricao": "Tabela que contém informações detalhadas dos produtos, como nome, categoria e preço unitário."
+        }
+    ],
+    "Medidas_do_Relatorio": [
+        {
+        "Nome": "Receita Total",
+        "Descricao": "Calcula a receita total das vendas somando o preço de venda multiplicado pela quantidade vendida."
+        },
+        {
+        "Nome": "Margem de Lucro",
+        "Descricao": "Calcula a margem de lucro subtraindo o custo do preço de venda."
+        }
+    ],
+    "Fontes_de_Dados": [
+        {
+        "Nome": "SQL Server - Vendas",
+        "Descricao": "Base de dados contendo todas as transações de vendas da empresa.",
+        "Tabelas_Contidas_no_M": [
+            "Vendas",
+            "Produtos"
+        ]
+        },
+        {
+        "Nome": "Excel - Orçamento",
+        "Descricao": "Planilha contendo dados de orçamento anual por departamento.",
+        "Tabelas_Contidas_no_M": [
+            "Orçamento"
+        ]
+        }
+    ]
+    }
+
+    Os dados do relatório do Power BI vêm na mensagem seguinte, entre <INICIO DADOS RELATORIO POWER BI> e <FIM DADOS RELATORIO POWER BI>,
+    uma linha por item no formato Nome | valor. As expressões M longas aparecem resumidas nas fontes, consultas e transformações que usam.
+    """
+    return prompt_relatorio
+
+def client_chat(messages, on_item=None):
+    """Envia as mensagens para o modelo e devolve o JSON da resposta. Como a temperatura é zero, a resposta é guardada
+    em um cache em disco endereçado pelo conteúdo das mensagens, pelo modelo e pela versão do prompt.
+    A resposta chega em stream e, se on_item for informado, cada item da lista da seção é entregue assim que termina
+    de ser escrito, sem esperar o resto. Respostas do cache passam pelo mesmo caminho"""
+    cache_key = llm_cache_key(messages)
+    cached = read_llm_cache(cache_key)
+    metrics = get_metrics()
+    parser = JsonItemParser()
+    if cached is not None:
+        metrics.increment('llm_cache_acertos_total')
+        if on_item:
+            for item in parser.feed(json.dumps(cached, ensure_ascii=False)):
+                on_item(item)
+        return cached
+
+    client = get_openai_client()
+    parts, usage = [], None
+    
+    with get_llm_semaphore(), metrics.span('client_chat'):
+        stream = client.chat.completions.create(
+            model=LLM_MODEL,
+            temperature=0,
+            max_tokens=LLM_MAX_OUTPUT_TOKENS,
+            messages=messages,
+            stream=True,
+            stream_options={'include_usage': True}
+        )
+        for chunk in stream:
+            usage = chunk.usage or usage
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if not text:
+                continue
+            parts.append(text)
+            for item in parser.feed(text):
+                if on_item:
+                    on_item(item)
+
+    metrics.increment('llm_requisicoes_total', modelo=LLM_MODEL)
+    if usage is not None:
+        metrics.increment('llm_tokens_total', usage.prompt_tokens, modelo=LLM_MODEL, tipo='prompt')
+        metrics.increment('llm_tokens_total', usage.completion_tokens, modelo=LLM_MODEL, tipo='completion')
+        metrics.record(tipo='llm', modelo=LLM_MODEL, prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+    content = json.loads(''.join(parts))
+    write_llm_cache(cache_key, content)
+    return content
+
+class JsonItemParser:
+    """Lê a resposta aos pedaços, conforme chega do stream, e devolve cada item da lista da seção assim que o objeto
+    dele fecha. A resposta pode vir como {"Secao": [{...}, ...]} ou direto como [{...}, ...]"""
+
+    def __init__(self):
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.item = None
+        self.item_depth = None
+
+    def feed(self, text):
+        items = []
+        for char in text:
+            if self.item is not None:
+                self.item.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                if char == '{' and self.item is None and self.stack in (['['], ['{', '[']):
+                    self.item, self.item_depth = [char], len(self.stack)
+                self.stack.append(char)
+            elif char in '}]':
+                if self.stack:
+                    self.stack.pop()
+                if self.item is not None and len(self.stack) == self.item_depth:
+                    items.append(json.loads(''.join(self.item)))
+                    self.item = None
+        return items
+
+# Semáforo compartilhado por todas as sessões e relatórios, para que documentar vários relatórios ao mesmo tempo
+# não multiplique as chamadas simultâneas ao LLM
+LLM_SEMAPHORE = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+def get_llm_semaphore():
+    return LLM_SEMAPHORE
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """Cliente da OpenAI reaproveitado por todas as chamadas, mantendo as conexões abertas. O openai só é importado
+    na primeira chamada que não está no cache"""
+    from openai import OpenAI
+    return OpenAI(api_key=API_KEY)
+
+def llm_cache_key(messages):
+    """Hash das mensagens normalizadas (sem indentação e linhas em branco), do modelo e da versão do prompt"""
+    normalized = [
+        {'role': message['role'], 'content': '\n'.join(line.strip() for line in message['content'].splitlines() if line.strip())}
+        for message in messages
+    ]
+    payload = json.dumps({'model': LLM_MODEL, 'prompt_version': PROMPT_VERSION, 'messages': normalized}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def llm_cache_path(cache_key):
+    return os.path.join(LLM_CACHE_DIR, cache_key[:2], f'{cache_key}.json')
+
+def read_llm_cache(cache_key):
+    """Retorna a resposta guardada ou None. A leitura atualiza a data do arquivo, então a remoção por tamanho descarta
+    primeiro as respostas usadas há mais tempo"""
+    path = llm_cache_path(cache_key)
+    try:
+        if time.time() - os.path.getmtime(path) > LLM_CACHE_MAX_AGE.total_seconds():
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            content = json.load(file)
+        os.utime(path)
+        return content
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def write_llm_cache(cache_key, content):
+    """Grava a resposta de forma atômica, para que sessões concorrentes nunca leiam um arquivo pela metade"""
+    path = llm_cache_path(cache_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(content, file, ensure_ascii=False)
+        size = file.tell()
+    os.replace(temp_path, path)
+
+    maybe_evict_llm_cache(size)
+
+# Tamanho do cache conhecido por este processo, para não percorrer o diretório inteiro a cada resposta gravada
+LLM_CACHE_STATE = {'lock': threading.Lock(), 'size': None, 'evicted_at': 0.0, 'evicting': False}
+
+def maybe_evict_llm_cache(written_bytes):
+    """Soma a gravação ao tamanho conhecido e só varre o cache na primeira gravação, quando o limite é passado ou a
+    cada LLM_CACHE_EVICT_INTERVAL segundos, o que também pega o que outros processos gravaram. Se outra thread já
+    estiver varrendo, a gravação só é somada"""
+    state = LLM_CACHE_STATE
+    with state['lock']:
+        if state['size'] is not None:
+            state['size'] += written_bytes
+        due = (state['size'] is None or state['size'] > LLM_CACHE_MAX_BYTES
+               or time.monotonic() - state['evicted_at'] >= LLM_CACHE_EVICT_INTERVAL)
+        if not due or state['evicting']:
+            return
+        state['evicting'] = True
+
+    size = None
+    try:
+        size = evict_llm_cache()
+    finally:
+        with state['lock']:
+            state.update(size=size, evicted_at=time.monotonic(), evicting=False)
+
+def evict_llm_cache():
+    """Remove as respostas mais antigas que LLM_CACHE_MAX_AGE e, se o cache ainda passar de LLM_CACHE_MAX_BYTES,
+    as usadas há mais tempo. Devolve o tamanho que sobrou"""
+    entries = []
+    now = time.time()
+
+    for root, _, files in os.walk(LLM_CACHE_DIR):
+        for file_name in files:
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(root, file_name)
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime > LLM_CACHE_MAX_AGE.total_seconds():
+                    os.remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= LLM_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+    return total_size
+
+@timed('Documenta')
+def Documenta(prompt, sections, on_item=None):
+    """Gera as seções da documentação. Tabelas, medidas e fontes são divididas em lotes que respeitam o orçamento de tokens
+    de entrada e de saída, todos os lotes são documentados em paralelo e as respostas são juntadas na ordem dos lotes.
+    Cada chamada leva apenas o prompt, os dados do próprio lote e a instrução da seção. Se on_item for informado,
+    recebe (seção, item) de cada item assim que ele fica pronto, a partir das threads do pool"""
+    prompt_tokens = estimate_tokens(prompt)
+    jobs = []
+
+    for section, instruction in DOCUMENTATION_SECTIONS.items():
+        if section not in sections:
+            continue
+        header, items = sections[section]
+        fixed_tokens = prompt_tokens + estimate_tokens(header) + estimate_tokens(instruction)
+
+        if section == 'Relatorio':
+            # O resumo do relatório é um único objeto, então vai em uma chamada só, com os nomes que couberem na entrada
+            batches = chunk_items(items, fixed_tokens, max_items=len(items) or 1)[:1]
+        else:
+            batches = chunk_items(items, fixed_tokens, max_items=(LLM_MAX_OUTPUT_TOKENS // LLM_TOKENS_PER_ITEM))
+            batches = [batch for batch in batches if batch]
+
+        jobs += [(section, header, batch) for batch in batches]
+
+    with ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS) as executor:
+        futures = [(section, executor.submit(document_batch, prompt, section, header, batch, on_item)) for section, header, batch in jobs]
+        responses = {section: [] for section in DOCUMENTATION_SECTIONS}
+        for section, future in futures:
+            responses[section].append(future.result())
+
+    return Documentation(
+        relatorio=responses['Relatorio'][0] if responses['Relatorio'] else {},
+        tabelas=merge_items(responses['Tabelas_do_Relatorio']),
+        medidas=merge_items(responses['Medidas_do_Relatorio']),
+        fontes=merge_sources([], [source for batch in responses['Fontes_de_Dados'] for source in batch], set())
+    )
+
+class DocumentationStream:
+    """Roda a documentação em uma thread e entrega, na thread de quem itera, cada (seção, item) assim que o LLM termina
+    de escrevê-lo. Depois da iteração, documentation tem o mesmo resultado que a função devolveria sem stream"""
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+        self.events = queue.Queue()
+        self.documentation = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.documentation = self.function(*self.args, on_item=lambda section, item: self.events.put((section, item)))
+        except Exception as error:
+            self.error = error
+        finally:
+            self.events.put(None)
+
+    def __iter__(self):
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            yield event
+        thread.join()
+        if self.error is not None:
+            raise self.error
+
+def estimate_tokens(text):
+    """Estimativa conservadora de tokens, cerca de 3 caracteres por token para texto em português e código DAX/M"""
+    return len(text) // 3 + 1
+
+def chunk_items(items, fixed_tokens, max_items, max_input_tokens=LLM_MAX_INPUT_TOKENS):
+    """Divide os itens em lotes de no máximo max_items cuja entrada estimada não passe de max_input_tokens.
+    Um item que sozinho passe do limite fica em um lote próprio"""
+    batches, batch, batch_tokens = [], [], fixed_tokens
+
+    for item in items:
+        item_tokens = estimate_tokens(item[1])
+        if batch and (batch_tokens + item_tokens > max_input_tokens or len(batch) >= max_items):
+            batches.append(batch)
+            batch, batch_tokens = [], fixed_tokens
+        batch.append(item)
+        batch_tokens += item_tokens
+
+    batches.append(batch)
+    return batches
+
+def document_batch(prompt, section, header, items, on_item=None):
+    """Documenta um lote. Se a resposta vier truncada e o JSON não puder ser lido, o lote é dividido ao meio e cada
+    metade é documentada separadamente; os itens já entregues ao on_item podem então chegar de novo"""
+    default = {} if section == 'Relatorio' else []
+    text = batch_text(header, items)
+    item_callback = (lambda item: on_item(section, item)) if on_item and section != 'Relatorio' else None
+
+    try:
+        response = client_chat(section_messages(prompt, text, section), item_callback)
+    except json.JSONDecodeError:
+        if section == 'Relatorio' or len(items) <= 1:
+            raise
+        middle = len(items) // 2
+        return document_batch(prompt, section, header, items[:middle], on_item) + document_batch(prompt, section, header, items[middle:], on_item)
+
+    result = extract_section(response, section, default)
+    # O resumo do relatório é um objeto só, entregue quando a resposta termina
+    if on_item and section == 'Relatorio':
+        on_item(section, result)
+    return result
+
+def batch_text(header, items):
+    """Texto do lote, uma linha 'Nome | valor' por item. Valores longos repetidos, como a mesma fonte M em várias tabelas,
+    são enviados uma única vez numa legenda e as linhas passam a citar o apelido"""
+    rows = [line.split(' | ', 1) for _, line in items]
+    counts = Counter(row[1] for row in rows if len(row) == 2 and len(row[1]) >= INTERN_MIN_CHARS)
+    aliases = {value: f'<V{i}>' for i, value in enumerate((value for value, count in counts.items() if count > 1), 1)}
+
+    lines = [f'{row[0]} | {aliases[row[1]]}' if len(row) == 2 and row[1] in aliases else ' | '.join(row) for row in rows]
+    if aliases:
+        lines.append('Valores repetidos (apelido = valor; nas respostas use o valor, não o apelido):')
+        lines += [f'{alias} = {value}' for value, alias in aliases.items()]
+    return '\n'.join([header, *lines])
+
+def merge_items(batches):
+    """Junta as respostas dos lotes na ordem em que foram criados, mantendo a primeira ocorrência de cada nome"""
+    merged, names = [], set()
+    for batch in batches:
+        for item in batch:
+            name = item.get('Nome') if isinstance(item, dict) else None
+            if name in names:
+                continue
+            if name is not None:
+                names.add(name)
+            merged.append(item)
+    return merged
+
+def documented_version_path(key):
+    return os.path.join(DOCUMENTATION_DIR, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json")
+
+def item_hashes(sections):
+    """Hash do conteúdo de cada item, por seção, usado para detectar o que mudou entre duas versões"""
+    return {
+        section: {name: hashlib.sha256(line.encode('utf-8')).hexdigest() for name, line in items}
+        for section, (_, items) in sections.items()
+    }
+
+def load_documented_version(key):
+    """Última versão documentada do relatório. Uma versão feita com outro modelo ou outro prompt conta como inexistente,
+    para que a troca de um deles refaça todas as descrições"""
+    try:
+        with open(documented_version_path(key), 'r', encoding='utf-8') as file:
+            version = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if version.get('modelo') != LLM_MODEL or version.get('versao_prompt') != PROMPT_VERSION:
+        return None
+    return version
+
+def save_documented_version(key, sections, documentation):
+    """Guarda os hashes dos itens e a documentação completa da versão que acabou de ser documentada"""
+    os.makedirs(DOCUMENTATION_DIR, exist_ok=True)
+    path = documented_version_path(key)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    version = {
+        'documentado_em': datetime.now(timezone.utc).isoformat(),
+        'modelo': LLM_MODEL,
+        'versao_prompt': PROMPT_VERSION,
+        'itens': item_hashes(sections),
+        'documentacao': asdict(documentation),
+    }
+
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(version, file, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+@timed('document_changes')
+def document_changes(prompt, sections, key, on_item=None):
+    """Re-documentação diferencial: compara os itens atuais com a última versão documentada do relatório, envia ao LLM
+    apenas as tabelas, medidas e fontes novas ou alteradas e reaproveita a descrição de todo o resto.
+    O resumo do relatório só é refeito quando a lista de tabelas e medidas muda. Os itens reaproveitados são entregues
+    ao on_item logo no início, antes dos que ainda vão ao LLM"""
+    previous = load_documented_version(key)
+    if previous is None:
+        documentation = Documenta(prompt, sections, on_item)
+        save_documented_version(key, sections, documentation)
+        return documentation
+
+    current_hashes = item_hashes(sections)
+    previous_hashes = previous['itens']
+    changed, removed = {}, {}
+    for section, hashes in current_hashes.items():
+        old = previous_hashes.get(section, {})
+        changed[section] = {name for name, item_hash in hashes.items() if old.get(name) != item_hash}
+        removed[section] = set(old) - set(hashes)
+
+    to_document = {}
+    for section, (header, items) in sections.items():
+        if section == 'Relatorio':
+            if changed[section] or removed[section]:
+                to_document[section] = (header, items)
+        else:
+            to_document[section] = (header, [item for item in items if item[0] in changed[section]])
+
+    old = Documentation(**previous['documentacao'])
+    if on_item:
+        for section, item in documentation_items(old):
+            stale = changed.get(section, set()) | removed.get(section, set())
+            if section == 'Relatorio' and 'Relatorio' not in to_document:
+                on_item(section, item)
+            elif section == 'Fontes_de_Dados':
+                tables = [table for table in item.get('Tabelas_Contidas_no_M', []) if table not in stale]
+                if tables:
+                    on_item(section, {**item, 'Tabelas_Contidas_no_M': tables})
+            elif section != 'Relatorio' and item.get('Nome') not in stale:
+                on_item(section, item)
+
+    new = Documenta(prompt, to_document, on_item)
+    order = {section: [name for name, _ in items] for section, (_, items) in sections.items()}
+
+    documentation = Documentation(
+        relatorio=new.relatorio if 'Relatorio' in to_document else old.relatorio,
+        tabelas=merge_changed(old.tabelas, new.tabelas, changed['Tabelas_do_Relatorio'] | removed['Tabelas_do_Relatorio'], order['Tabelas_do_Relatorio']),
+        medidas=merge_changed(old.medidas, new.medidas, changed['Medidas_do_Relatorio'] | removed['Medidas_do_Relatorio'], order['Medidas_do_Relatorio']),
+        fontes=merge_sources(old.fontes, new.fontes, changed['Fontes_de_Dados'] | removed['Fontes_de_Dados']),
+        alteracoes=changelog(previous_hashes, current_hashes)
+    )
+
+    save_documented_version(key, sections, documentation)
+    return documentation
+
+def merge_changed(old_items, new_items, stale_names, order):
+    """Mantém as descrições antigas que continuam válidas, acrescenta as novas e segue a ordem atual dos itens"""
+    kept = [item for item in old_items if item.get('Nome') not in stale_names]
+    merged = merge_items([new_items, kept])
+    position = {name: i for i, name in enumerate(order)}
+    return sorted(merged, key=lambda item: position.get(item.get('Nome'), len(position)))
+
+def changelog(previous_hashes, current_hashes):
+    """Lista as tabelas e medidas adicionadas, modificadas e removidas desde a última documentação"""
+    changes = []
+    for section, kind in (('Tabelas_do_Relatorio', 'Tabela'), ('Medidas_do_Relatorio', 'Medida')):
+        old, new = previous_hashes.get(section, {}), current_hashes.get(section, {})
+        for name in sorted(set(old) | set(new)):
+            if name not in old:
+                changes.append({'Tipo': kind, 'Nome': name, 'Alteracao': 'Adicionada'})
+            elif name not in new:
+                changes.append({'Tipo': kind, 'Nome': name, 'Alteracao': 'Removida'})
+            elif old[name] != new[name]:
+                changes.append({'Tipo': kind, 'Nome': name, 'Alteracao': 'Modificada'})
+    return changes
+
+def section_messages(prompt, text, section):
+    """Mensagens de um lote: o prompt da seção na mensagem de sistema, os dados do lote e a instrução da seção"""
+    return [
+        {"role": "system", "content": section_prompt(prompt, section)},
+        {"role": "user", "content": f"<INICIO DADOS RELATORIO POWER BI>\n{text}\n<FIM DADOS RELATORIO POWER BI>"},
+        {"role": "user", "content": DOCUMENTATION_SECTIONS[section]}
+    ]
+
+@lru_cache(maxsize=32)
+def section_prompt(prompt, section):
+    """O prompt sem indentação e com o exemplo de documentação reduzido à seção pedida, já que cada chamada devolve uma
+    seção só. O exemplo completo, com as quatro seções, é a maior parte do prompt e seria pago em todos os lotes"""
+    marker = prompt.find('Exemplo de Documentação:')
+    start = prompt.find('{', marker) if marker >= 0 else -1
+    if start < 0:
+        return compact_lines(prompt)
+    try:
+        example, end = json.JSONDecoder().raw_decode(prompt, start)
+    except json.JSONDecodeError:
+        return compact_lines(prompt)
+    if section not in example:
+        return compact_lines(prompt)
+    return '\n'.join([compact_lines(prompt[:start]), json.dumps({section: example[section]}, ensure_ascii=False), compact_lines(prompt[end:])])
+
+def compact_lines(text):
+    """Remove a indentação e as linhas em branco do texto"""
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+def extract_section(response, section, default):
+    """O chat às vezes devolve a seção dentro da chave pedida e às vezes direto, então as duas formas são aceitas"""
+    if isinstance(response, dict) and section in response:
+        return response[section]
+    if isinstance(response, type(default)):
+        return response
+    return default
@@ -0,0 +1,162 @@
+"""Exportação do modelo e da documentação para Excel e Word. O xlsxwriter e o python-docx só são importados quando
+uma exportação é pedida"""
+import pandas as pd
+from collections import defaultdict
+from io import BytesIO
+
+from documentador.metrics import timed
+from documentador.models import dataframe_rows, documentation_items, merge_sources
+
+@timed('export_model_excel')
+def export_model_excel(model):
+    """Exporta o modelo normalizado com o xlsxwriter em modo constant_memory: as linhas são gravadas em ordem e
+    descarregadas a cada linha, então a memória não cresce com o tamanho do modelo. Uma aba para tabelas, colunas,
+    medidas e fontes"""
+    sources = {}
+    for row in model.tabelas[['NomeTabela', 'FonteDados']].itertuples(index=False):
+        if pd.notnull(row.FonteDados):
+            sources.setdefault(row.FonteDados, []).append(row.NomeTabela)
+
+    import xlsxwriter
+    buffer = BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {'constant_memory': True})
+    write_sheet(workbook, 'tabelas', list(model.tabelas.columns), dataframe_rows(model.tabelas))
+    write_sheet(workbook, 'colunas', list(model.colunas.columns), dataframe_rows(model.colunas))
+    write_sheet(workbook, 'medidas', list(model.medidas.columns), dataframe_rows(model.medidas))
+    write_sheet(workbook, 'fontes', ['FonteDados', 'Tabelas'], ((source, ', '.join(tables)) for source, tables in sources.items()))
+    workbook.close()
+
+    buffer.seek(0)
+    return buffer
+
+def write_sheet(workbook, sheet_name, columns, rows):
+    """Escreve o cabeçalho e as linhas de uma aba na ordem, como o modo constant_memory exige"""
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, columns, workbook.add_format({'bold': True}))
+    for row_number, row in enumerate(rows, start=1):
+        worksheet.write_row(row_number, 0, row)
+
+def add_docx_table(doc, columns, rows):
+    """Insere uma tabela inteira no Word de uma vez: cria todas as linhas e preenche as células percorrendo-as uma única vez"""
+    rows = list(rows)
+    table = doc.add_table(rows=len(rows) + 1, cols=len(columns))
+    table.style = 'Table Grid'
+    for table_row, values in zip(table.rows, [columns, *rows]):
+        for cell, value in zip(table_row.cells, values):
+            cell.text = '' if value is None else str(value)
+    return table
+
+def measure_expressions(measures_df):
+    """Dicionário nome da medida -> DAX, montado uma vez, para não buscar cada medida no DataFrame"""
+    measures_df = measures_df.drop_duplicates('NomeMedida')
+    return dict(zip(measures_df['NomeMedida'], measures_df['ExpressaoMedida']))
+
+@timed('generate_docx')
+def generate_docx(documentation, measures_df):
+    """Função responsável por gerar o Word a partir da documentação. Tabelas, medidas e fontes viram tabelas do Word"""
+    from docx import Document
+    doc = Document()
+    info = documentation.relatorio
+    
+    doc.add_paragraph(f'Título do relatório: {info.get("Titulo", "")}')
+    doc.add_paragraph(f'Descrição: {info.get("Descricao", "")}')
+    doc.add_paragraph(f'Principais KPIs e Métricas: {", ".join(info.get("Principais_KPIs_e_Metricas", []))}')
+    doc.add_paragraph(f'Público alvo: {info.get("Publico_Alvo", "")}')
+    doc.add_paragraph(f'Exemplos de uso: {", ".join(info.get("Exemplos_de_Uso", []))}\n')
+
+    doc.add_paragraph('Tabelas do relatório')
+    add_docx_table(doc, ['Tabela', 'Descrição'], ((table.get('Nome'), table.get('Descricao')) for table in documentation.tabelas))
+
+    doc.add_paragraph('\nMedidas do relatório')
+    
+    # Para não fazer o chat repetir a expressão ela é pega de um dicionário montado a partir do dataframe
+    if documentation.medidas:
+        expressions = measure_expressions(measures_df)
+        add_docx_table(doc, ['Nome', 'Descrição', 'Fórmula DAX'], (
+            (measure.get('Nome'), measure.get('Descricao'), expressions.get(measure.get('Nome'), ''))
+            for measure in documentation.medidas
+        ))
+    else:
+        doc.add_paragraph('O relatório não possui medidas')
+
+    doc.add_paragraph('\nFonte de dados do relatório')
+    add_docx_table(doc, ['Nome', 'Descrição', 'Tabelas contidas no M'], (
+        (source.get('Nome'), source.get('Descricao'), ', '.join(source.get('Tabelas_Contidas_no_M', [])))
+        for source in documentation.fontes
+    ))
+
+    if documentation.alteracoes:
+        doc.add_paragraph('\nAlterações desde a última documentação')
+        add_docx_table(doc, ['Tipo', 'Nome', 'Alteração'], ((change['Tipo'], change['Nome'], change['Alteracao']) for change in documentation.alteracoes))
+
+    return doc
+
+@timed('generate_excel')
+def generate_excel(documentation, measures_df):
+    """Função responsável por tratar e gerar o excel do output do chatgpt, em modo constant_memory"""
+    excel = DocumentationExcel(measures_df)
+    for section, item in documentation_items(documentation):
+        excel.add(section, item)
+    return excel.close(documentation.alteracoes)
+
+class DocumentationExcel:
+    """Planilha da documentação escrita item a item, conforme os itens chegam, em modo constant_memory. Serve tanto para
+    uma documentação pronta quanto para o stream do LLM; um item repetido na mesma seção, como acontece quando um lote
+    truncado é refeito em duas metades, é gravado uma vez só. As fontes são gravadas só no fechamento, já que a mesma
+    fonte pode chegar em vários lotes, cada um com uma parte das tabelas"""
+
+    SHEETS = {
+        'Relatorio': ('info_painel', ['Informações do relatório', 'Dados']),
+        'Tabelas_do_Relatorio': ('tabelas', ['Nome', 'Descricao']),
+        'Medidas_do_Relatorio': ('medidas', ['Nome', 'Descricao', 'ExpressaoMedida']),
+        'Fontes_de_Dados': ('fonte_de_dados', ['Nome', 'Descricao', 'Tabelas_Contidas_no_M']),
+    }
+
+    def __init__(self, measures_df):
+        import xlsxwriter
+        self.buffer = BytesIO()
+        self.expressions = measure_expressions(measures_df)
+        self.workbook = xlsxwriter.Workbook(self.buffer, {'constant_memory': True})
+        self.bold = self.workbook.add_format({'bold': True})
+        self.sheets, self.next_rows, self.names = {}, {}, defaultdict(set)
+        self.sources = []
+        for section, (sheet_name, columns) in self.SHEETS.items():
+            self.sheets[section] = self.workbook.add_worksheet(sheet_name)
+            self.sheets[section].write_row(0, 0, columns, self.bold)
+            self.next_rows[section] = 1
+
+    def add(self, section, item):
+        if section == 'Fontes_de_Dados':
+            self.sources = merge_sources(self.sources, [item], set())
+            return
+
+        name = item.get('Nome') if section != 'Relatorio' else None
+        if name is not None:
+            if name in self.names[section]:
+                return
+            self.names[section].add(name)
+
+        for row in self.rows(section, item):
+            self.sheets[section].write_row(self.next_rows[section], 0, row)
+            self.next_rows[section] += 1
+
+    def rows(self, section, item):
+        if section == 'Relatorio':
+            return [(key, ', '.join(value) if isinstance(value, list) else value) for key, value in item.items()]
+        if section == 'Medidas_do_Relatorio':
+            return [(item.get('Nome'), item.get('Descricao'), self.expressions.get(item.get('Nome')))]
+        if section == 'Fontes_de_Dados':
+            return [(item.get('Nome'), item.get('Descricao'), ', '.join(item.get('Tabelas_Contidas_no_M', [])))]
+        return [(item.get('Nome'), item.get('Descricao'))]
+
+    def close(self, changes=()):
+        """Fecha a planilha, acrescentando a aba de alterações da documentação diferencial, e devolve o arquivo"""
+        for source in self.sources:
+            for row in self.rows('Fontes_de_Dados', source):
+                self.sheets['Fontes_de_Dados'].write_row(self.next_rows['Fontes_de_Dados'], 0, row)
+                self.next_rows['Fontes_de_Dados'] += 1
+        if changes:
+            write_sheet(self.workbook, 'alteracoes', ['Tipo', 'Nome', 'Alteracao'], ((change['Tipo'], change['Nome'], change['Alteracao']) for change in changes))
+        self.workbook.close()
+        self.buffer.seek(0)
+        return self.buffer
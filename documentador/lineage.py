@@ -0,0 +1,146 @@
+"""Linhagem e análise de impacto entre fontes, expressões M, tabelas, colunas e medidas"""
+from collections import defaultdict, deque, namedtuple
+
+from documentador.metrics import timed
+from documentador.models import report_key
+from documentador.parsers import DAX_BRACKET_REFERENCE, DAX_COLUMN_REFERENCE, DAX_QUOTED_TABLE, IDENTIFIER, STRINGS_AND_COMMENTS, m_parameters, m_query_references, m_sources
+
+# Nó do grafo de linhagem. Para fontes externas, tabela guarda o conector (ex.: Sql.Database) e nome os argumentos;
+# dataset fica vazio, a não ser que os argumentos não sejam conhecidos
+Node = namedtuple('Node', ['tipo', 'dataset', 'tabela', 'nome'])
+
+class LineageIndex:
+    """Grafo de dependências entre fontes, expressões M, tabelas, colunas e medidas, com adjacência nos dois sentidos.
+    depends_on responde "do que isso depende" e used_by responde "o que quebra se isso for removido". As fontes externas
+    não pertencem a um dataset, então o mesmo servidor liga os datasets de toda a workspace ou tenant. Uma fonte cujos
+    argumentos não são conhecidos, como um servidor vindo de uma expressão, fica presa ao próprio dataset, para não ligar
+    datasets que leem de servidores diferentes"""
+
+    def __init__(self):
+        self.depends_on = defaultdict(set)
+        self.used_by = defaultdict(set)
+        self.all_nodes = set()
+
+    def add_node(self, node):
+        self.all_nodes.add(node)
+
+    def add_edge(self, node, dependency):
+        if node == dependency:
+            return
+        self.all_nodes.update((node, dependency))
+        self.depends_on[node].add(dependency)
+        self.used_by[dependency].add(node)
+
+    def add_model(self, model):
+        """Inclui no grafo as tabelas, expressões, colunas e medidas de um modelo"""
+        dataset = report_key(model)
+        tables = set(model.tabelas['NomeTabela'])
+        query_names = tables | set(model.expressoes['NomeExpressao'])
+        measures = dict(zip(model.medidas['NomeMedida'], model.medidas['NomeTabela']))
+        columns = set(zip(model.colunas['NomeTabela'], model.colunas['NomeColuna']))
+        parameters = m_parameters(zip(model.expressoes['NomeExpressao'], model.expressoes['ExpressaoM']))
+
+        for row in model.tabelas[['NomeTabela', 'FonteDados']].itertuples(index=False):
+            node = Node('tabela', dataset, row.NomeTabela, row.NomeTabela)
+            self.add_node(node)
+            if isinstance(row.FonteDados, str):
+                self.add_m_dependencies(node, row.FonteDados, dataset, tables, query_names - {row.NomeTabela}, parameters)
+
+        for row in model.expressoes.itertuples(index=False):
+            node = Node('expressao', dataset, None, row.NomeExpressao)
+            self.add_node(node)
+            if isinstance(row.ExpressaoM, str):
+                self.add_m_dependencies(node, row.ExpressaoM, dataset, tables, query_names - {row.NomeExpressao}, parameters)
+
+        for row in model.colunas[['NomeTabela', 'NomeColuna', 'ExpressaoColuna']].itertuples(index=False):
+            node = Node('coluna', dataset, row.NomeTabela, row.NomeColuna)
+            self.add_edge(node, Node('tabela', dataset, row.NomeTabela, row.NomeTabela))
+            # Colunas calculadas também dependem do que o DAX delas referencia
+            if isinstance(row.ExpressaoColuna, str) and row.ExpressaoColuna != 'N/A':
+                for dependency in dax_references(row.ExpressaoColuna, dataset, row.NomeTabela, tables, columns, measures):
+                    self.add_edge(node, dependency)
+
+        for row in model.medidas.itertuples(index=False):
+            node = Node('medida', dataset, row.NomeTabela, row.NomeMedida)
+            self.add_edge(node, Node('tabela', dataset, row.NomeTabela, row.NomeTabela))
+            if isinstance(row.ExpressaoMedida, str):
+                for dependency in dax_references(row.ExpressaoMedida, dataset, row.NomeTabela, tables, columns, measures):
+                    self.add_edge(node, dependency)
+
+    def add_m_dependencies(self, node, expression, dataset, tables, query_names, parameters):
+        """Liga o nó às fontes externas chamadas no M e às outras consultas (tabelas ou expressões) que ele referencia"""
+        for connector, arguments in m_sources(expression, parameters):
+            if arguments:
+                self.add_edge(node, Node('fonte', None, connector, ', '.join(arguments)))
+            else:
+                self.add_edge(node, Node('fonte', dataset, connector, ''))
+        for name in m_query_references(expression, query_names):
+            if name in tables:
+                self.add_edge(node, Node('tabela', dataset, name, name))
+            else:
+                self.add_edge(node, Node('expressao', dataset, None, name))
+
+    def traverse(self, node, adjacency):
+        seen, queue = set(), deque([node])
+        while queue:
+            for neighbor in adjacency.get(queue.popleft(), ()):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+        return seen
+
+    def impact(self, node):
+        """Tudo que depende, direta ou indiretamente, do nó"""
+        return self.traverse(node, self.used_by)
+
+    def upstream(self, node):
+        """Tudo de que o nó depende, direta ou indiretamente"""
+        return self.traverse(node, self.depends_on)
+
+    def nodes(self, kind=None):
+        return [node for node in self.all_nodes if kind is None or node.tipo == kind]
+
+@timed('build_lineage')
+def build_lineage(models):
+    """Monta o grafo de linhagem de um ou vários modelos, por exemplo todos os datasets de um scan"""
+    lineage = LineageIndex()
+    for model in models:
+        lineage.add_model(model)
+    return lineage
+
+def dax_references(expression, dataset, table, tables, columns, measures):
+    """Resolve as referências de uma expressão DAX: Tabela[Coluna], 'Tabela'[Coluna], [Medida], [Coluna] da própria
+    tabela e tabelas usadas sozinhas, como em ALL('Tabela') ou COUNTROWS(Tabela)"""
+    text = STRINGS_AND_COMMENTS.sub(lambda match: '""' if match.group(0).startswith('"') else ' ', expression)
+    references = set()
+
+    def qualified(match):
+        ref_table = (match.group(1) or match.group(2)).replace("''", "'")
+        name = match.group(3)
+        if (ref_table, name) not in columns and name in measures:
+            references.add(Node('medida', dataset, measures[name], name))
+        else:
+            references.add(Node('coluna', dataset, ref_table, name))
+        return ' '
+
+    text = DAX_COLUMN_REFERENCE.sub(qualified, text)
+
+    for match in DAX_BRACKET_REFERENCE.finditer(text):
+        name = match.group(1)
+        if name in measures and (table, name) not in columns:
+            references.add(Node('medida', dataset, measures[name], name))
+        else:
+            references.add(Node('coluna', dataset, table, name))
+    text = DAX_BRACKET_REFERENCE.sub(' ', text)
+
+    for match in DAX_QUOTED_TABLE.finditer(text):
+        name = match.group(1).replace("''", "'")
+        if name in tables:
+            references.add(Node('tabela', dataset, name, name))
+    text = DAX_QUOTED_TABLE.sub(' ', text)
+
+    for match in IDENTIFIER.finditer(text):
+        if match.group(1) in tables:
+            references.add(Node('tabela', dataset, match.group(1), match.group(1)))
+
+    return references
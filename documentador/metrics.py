@@ -0,0 +1,136 @@
+"""Tempos por etapa, contadores e medidores do processo, exportados em JSON lines e no formato do Prometheus"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+from documentador.config import METRICS_JSONL, METRICS_PROM_PATH
+
+class Metrics:
+    """Tempos por etapa, contadores e medidores do processo, compartilhados por todas as sessões. Contadores e
+    medidores são identificados pelo nome e pelos rótulos, como no Prometheus"""
+
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = jsonl_path
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        # Etapa -> [chamadas, segundos somados, maior duração]
+        self.spans = defaultdict(lambda: [0, 0.0, 0.0])
+        self.lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[name, tuple(sorted(labels.items()))] += value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[name, tuple(sorted(labels.items()))] = value
+
+    @contextmanager
+    def span(self, stage):
+        """Mede o tempo do bloco como uma execução da etapa, inclusive quando termina em erro"""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as exception:
+            error = type(exception).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                stats = self.spans[stage]
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+            self.record(tipo='etapa', etapa=stage, segundos=round(elapsed, 6), erro=error)
+
+    def record(self, **event):
+        """Acrescenta o evento ao arquivo JSONL, se configurado"""
+        if not self.jsonl_path:
+            return
+        line = json.dumps({'momento': datetime.now(timezone.utc).isoformat(), **event}, ensure_ascii=False)
+        with self.lock:
+            os.makedirs(os.path.dirname(self.jsonl_path) or '.', exist_ok=True)
+            with open(self.jsonl_path, 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
+
+    def stages(self):
+        """Tempos acumulados por etapa, da mais demorada para a mais rápida"""
+        with self.lock:
+            rows = [(stage, calls, total, total / calls, longest) for stage, (calls, total, longest) in self.spans.items()]
+        import pandas as pd
+        df = pd.DataFrame(rows, columns=['Etapa', 'Chamadas', 'SegundosTotal', 'SegundosMedio', 'SegundosMaximo'])
+        return df.sort_values('SegundosTotal', ascending=False).reset_index(drop=True)
+
+    def values(self):
+        """Contadores e medidores atuais"""
+        with self.lock:
+            rows = [(name, 'contador', format_labels(labels), value) for (name, labels), value in self.counters.items()]
+            rows += [(name, 'medidor', format_labels(labels), value) for (name, labels), value in self.gauges.items()]
+        import pandas as pd
+        return pd.DataFrame(sorted(rows), columns=['Metrica', 'Tipo', 'Rotulos', 'Valor'])
+
+    def prometheus(self):
+        """Estado atual no formato de texto do Prometheus"""
+        with self.lock:
+            series = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                series[f'documentador_{name}', 'counter'].append((labels, value))
+            for (name, labels), value in self.gauges.items():
+                series[f'documentador_{name}', 'gauge'].append((labels, value))
+            for stage, (calls, total, longest) in self.spans.items():
+                labels = (('etapa', stage),)
+                series['documentador_etapa_chamadas_total', 'counter'].append((labels, calls))
+                series['documentador_etapa_segundos_total', 'counter'].append((labels, total))
+                series['documentador_etapa_segundos_maximo', 'gauge'].append((labels, longest))
+
+        lines = []
+        for (name, kind), samples in sorted(series.items()):
+            lines.append(f'# TYPE {name} {kind}')
+            lines += [f'{name}{prometheus_labels(labels)} {value:g}' for labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Grava o textfile de forma atômica, para que o coletor nunca leia um arquivo pela metade"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(self.prometheus())
+        os.replace(temporary, path)
+
+def format_labels(labels):
+    return ', '.join(f'{key}={value}' for key, value in labels)
+
+def prometheus_labels(labels):
+    """Rótulos no formato {chave="valor"}, escapando barras, aspas e quebras de linha"""
+    if not labels:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+def timed(stage):
+    """Decorador que mede cada chamada da função como uma execução da etapa"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def export_metrics():
+    """Regrava o textfile do Prometheus, se configurado"""
+    if METRICS_PROM_PATH:
+        get_metrics().write_prometheus(METRICS_PROM_PATH)
+
+def get_metrics():
+    """Métricas compartilhadas por todas as sessões do processo"""
+    return METRICS
+
+# Criadas na importação: o módulo é carregado uma única vez por processo, mesmo com as execuções repetidas do Streamlit
+METRICS = Metrics(METRICS_JSONL)
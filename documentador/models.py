@@ -0,0 +1,82 @@
+"""Modelos compartilhados pelos módulos: o modelo normalizado do relatório, o índice do scan e a documentação"""
+import pandas as pd
+from dataclasses import dataclass, field
+
+@dataclass
+class ReportModel:
+    """Modelo normalizado do relatório: tabelas, colunas e medidas em DataFrames separados, ligados pela coluna NomeTabela.
+    As expressões M compartilhadas do dataset (parâmetros e consultas sem tabela) ficam em expressoes"""
+    tabelas: pd.DataFrame
+    colunas: pd.DataFrame
+    medidas: pd.DataFrame
+    expressoes: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=['NomeExpressao', 'ExpressaoM']))
+
+    @property
+    def nome(self):
+        """Nome do relatório ao qual o modelo pertence"""
+        if self.tabelas.empty:
+            return ''
+        return self.tabelas['ReportName'].iloc[0]
+
+    def desnormalizar(self):
+        """Monta a visão desnormalizada (tabelas x medidas x colunas). Deve ser chamada apenas quando a visão for solicitada,
+        pois gera uma linha para cada par (medida, coluna) de cada tabela"""
+        df = self.tabelas.merge(self.medidas, on='NomeTabela', how='left')
+        return df.merge(self.colunas, on='NomeTabela', how='left')
+
+@dataclass
+class ScanIndex:
+    """Índice do resultado do scan, montado uma única vez: o modelo de cada dataset já extraído, por id, e os relatórios
+    que podem ser selecionados, por nome. Selecionar um relatório é uma consulta ao dicionário"""
+    modelos: dict
+    relatorios: dict
+
+    def get(self, report_name):
+        dataset_id = self.relatorios.get(report_name)
+        return self.modelos.get(dataset_id)
+
+@dataclass
+class Documentation:
+    """Documentação gerada pelo LLM, renderizada tanto pela exportação para Word quanto para Excel"""
+    relatorio: dict
+    tabelas: list
+    medidas: list
+    fontes: list
+    alteracoes: list = field(default_factory=list)
+
+def documentation_items(documentation):
+    """A documentação pronta como a mesma sequência de (seção, item) que o stream entrega"""
+    if documentation.relatorio:
+        yield 'Relatorio', documentation.relatorio
+    for section, items in (('Tabelas_do_Relatorio', documentation.tabelas), ('Medidas_do_Relatorio', documentation.medidas), ('Fontes_de_Dados', documentation.fontes)):
+        for item in items:
+            yield section, item
+
+def merge_sources(old_sources, new_sources, stale_tables):
+    """As fontes agrupam várias tabelas, então as tabelas alteradas ou removidas saem das fontes antigas e as fontes
+    novas são somadas às de mesmo nome. Também junta as fontes que vêm em lotes diferentes da mesma documentação"""
+    merged = {}
+    for source in old_sources:
+        tables = [table for table in source.get('Tabelas_Contidas_no_M', []) if table not in stale_tables]
+        if tables:
+            merged[source['Nome']] = {**source, 'Tabelas_Contidas_no_M': tables}
+
+    for source in new_sources:
+        if source['Nome'] in merged:
+            tables = merged[source['Nome']]['Tabelas_Contidas_no_M']
+            tables += [table for table in source.get('Tabelas_Contidas_no_M', []) if table not in tables]
+        else:
+            merged[source['Nome']] = {**source, 'Tabelas_Contidas_no_M': list(source.get('Tabelas_Contidas_no_M', []))}
+
+    return list(merged.values())
+
+def report_key(model):
+    """Identifica o relatório entre execuções: o DatasetId quando existir, senão o nome do relatório"""
+    if not model.tabelas.empty and pd.notnull(model.tabelas['DatasetId'].iloc[0]):
+        return str(model.tabelas['DatasetId'].iloc[0])
+    return model.nome
+
+def dataframe_rows(df):
+    """Percorre o DataFrame linha a linha trocando NaN por vazio, que o xlsxwriter não aceita como número"""
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(None if isinstance(value, float) and value != value else value for value in row)
@@ -0,0 +1,236 @@
+"""Leitura dos arquivos .pbit e das expressões DAX e M: fontes, referências entre consultas e versões compactas para o prompt"""
+import json
+import pandas as pd
+import re
+from zipfile import ZipFile
+
+from documentador.config import M_SUMMARY_MIN_CHARS
+from documentador.metrics import timed
+from documentador.models import ReportModel
+
+def join_expression(expression):
+    """As expressões do DataModelSchema podem vir como texto ou como lista de linhas"""
+    if isinstance(expression, list):
+        return '\n'.join(expression)
+    return expression
+
+@timed('parse_pbit')
+def parse_pbit(pbit_file, report_name):
+    """Lê o .pbit direto do zip em memória, sem extrair para o disco. Apenas as entradas Connections e DataModelSchema
+    são abertas, o JSON é decodificado uma única vez e cada DataFrame é montado de uma vez a partir de listas"""
+    with ZipFile(pbit_file, 'r') as zipf:
+        entries = set(zipf.namelist())
+        connections = json.loads(zipf.read('Connections').decode('utf-8')) if 'Connections' in entries else {}
+        # O DataModelSchema é gravado em UTF-16 LE, às vezes com BOM
+        content = json.loads(zipf.read('DataModelSchema').decode('utf-16-le').lstrip('\ufeff'))
+
+    remote_artifacts = connections.get('RemoteArtifacts') or [{}]
+    dataset_id = remote_artifacts[0].get('DatasetId')
+    report_id = remote_artifacts[0].get('ReportId')
+
+    table_rows, column_rows, measure_rows = [], [], []
+
+    for table in content.get('model', {}).get('tables', []):
+        table_name = table['name']
+        if 'DateTable' in table_name:
+            continue
+
+        for measure in table.get('measures', []):
+            measure_rows.append((table_name, measure['name'], join_expression(measure['expression'])))
+
+        for col in table.get('columns', []):
+            column_rows.append((
+                table_name,
+                col['name'],
+                col.get('dataType'),
+                col.get('type', 'N/A'),
+                join_expression(col.get('expression', 'N/A'))
+            ))
+
+        partitions = table.get('partitions') or [{}]
+        source = join_expression(partitions[0].get('source', {}).get('expression'))
+        table_rows.append((dataset_id, report_id, report_name, table_name, source))
+
+    df_tables = pd.DataFrame(table_rows, columns=['DatasetId', 'ReportId', 'ReportName', 'NomeTabela', 'FonteDados'])
+    df_columns = pd.DataFrame(column_rows, columns=['NomeTabela', 'NomeColuna', 'TipoDadoColuna', 'TipoColuna', 'ExpressaoColuna'])
+    df_measures = pd.DataFrame(measure_rows, columns=['NomeTabela', 'NomeMedida', 'ExpressaoMedida'])
+
+    expression_rows = [(expression['name'], join_expression(expression.get('expression'))) for expression in content.get('model', {}).get('expressions', [])]
+    df_expressions = pd.DataFrame(expression_rows, columns=['NomeExpressao', 'ExpressaoM'])
+
+    return ReportModel(tabelas=df_tables, colunas=df_columns, medidas=df_measures, expressoes=df_expressions)
+
+# Textos e comentários do DAX e do M. Os textos entram na mesma expressão para que // dentro de uma URL não seja lido como comentário
+STRINGS_AND_COMMENTS = re.compile(r'"(?:[^"]|"")*"|//[^\n]*|--[^\n]*|/\*.*?\*/', re.S)
+
+M_STRINGS_AND_COMMENTS = re.compile(r'"(?:[^"]|"")*"|//[^\n]*|/\*.*?\*/', re.S)
+
+DAX_COLUMN_REFERENCE = re.compile(r"(?:'((?:[^']|'')+)'|([A-Za-z_]\w*))\[([^\]]+)\]")
+
+DAX_BRACKET_REFERENCE = re.compile(r'\[([^\]]+)\]')
+
+DAX_QUOTED_TABLE = re.compile(r"'((?:[^']|'')+)'")
+
+IDENTIFIER = re.compile(r'(?<![\w.])([A-Za-z_]\w*)(?!\s*[\[(\w])')
+
+M_FUNCTION_CALL = re.compile(r'\b([A-Z][A-Za-z0-9]*(?:\.[A-Z][A-Za-z0-9]*)+)\s*\(')
+
+M_STRING = re.compile(r'"((?:[^"]|"")*)"')
+
+M_QUOTED_IDENTIFIER = re.compile(r'#"((?:[^"]|"")*)"')
+
+# Sufixos das funções do M que acessam dados externos, como Sql.Database, Web.Contents e OData.Feed
+M_SOURCE_SUFFIXES = {'Database', 'Databases', 'Contents', 'Feed', 'Files', 'DataSource', 'Query', 'Tables', 'Catalogs', 'Blobs', 'Dataflows', 'Domains', 'Data'}
+
+def m_sources(expression, parameters=None):
+    """Chamadas a conectores no M, como Sql.Database("servidor", "banco"), devolvidas como (conector, argumentos em texto).
+    Argumentos que são parâmetros do dataset, como Sql.Database(Servidor, "dw"), viram o valor do parâmetro quando ele
+    está em parameters (ver m_parameters)"""
+    parameters = parameters or {}
+    text = M_STRINGS_AND_COMMENTS.sub(lambda match: match.group(0) if match.group(0).startswith('"') else ' ', expression)
+    # As chamadas são procuradas com o conteúdo dos textos apagado, do mesmo tamanho, para não achar um conector dentro de
+    # um texto; os argumentos são lidos do texto original
+    masked = M_STRING.sub(lambda match: '"' + ' ' * (len(match.group(0)) - 2) + '"', text)
+    sources = []
+
+    for match in M_FUNCTION_CALL.finditer(masked):
+        connector = match.group(1)
+        if connector.rsplit('.', 1)[1] not in M_SOURCE_SUFFIXES:
+            continue
+
+        # Só os argumentos iniciais que são textos literais identificam a fonte; parâmetros aparecem como referências
+        arguments, position = [], match.end()
+        while True:
+            while position < len(text) and text[position].isspace():
+                position += 1
+            string = M_STRING.match(text, position)
+            reference = M_ARGUMENT_REFERENCE.match(text, position) if not string else None
+            if string:
+                arguments.append(string.group(1).replace('""', '"'))
+                position = string.end()
+            elif reference and m_name(reference.group(1)) in parameters:
+                arguments.append(parameters[m_name(reference.group(1))])
+                position = reference.end()
+            else:
+                break
+            while position < len(text) and text[position].isspace():
+                position += 1
+            if position >= len(text) or text[position] != ',':
+                break
+            position += 1
+
+        sources.append((connector, tuple(arguments)))
+
+    return sources
+
+M_IDENTIFIERS_STRINGS_AND_COMMENTS = re.compile(r'#"(?:[^"]|"")*"|"(?:[^"]|"")*"|//[^\n]*|/\*.*?\*/', re.S)
+
+# Acesso a campo ou registro entre colchetes, como each [Produto] ou Fonte{[Item="Vendas"]}[Data], sem colchetes dentro
+M_BRACKETS = re.compile(r'\[[^\[\]]*\]')
+
+M_NAME = r'#"(?:[^"]|"")*"|[A-Za-z_][\w.]*'
+
+# Nomes definidos dentro da própria expressão: os passos do let e os parâmetros de funções, como (linha) =>
+# Argumento que é só o nome de uma consulta, como o parâmetro Servidor em Sql.Database(Servidor, "dw")
+M_ARGUMENT_REFERENCE = re.compile(rf'({M_NAME})\s*(?=[,)])')
+
+# Parâmetro do Power BI: um texto literal seguido dos metadados, como "srv-prod" meta [IsParameterQuery=true, ...]
+M_PARAMETER = re.compile(r'\s*"((?:[^"]|"")*)"\s*(?:meta\b.*)?', re.S)
+
+M_LET_STEP = re.compile(rf'(?:\blet\b|,)\s*({M_NAME})\s*=(?![=>])')
+
+M_FUNCTION_PARAMETERS = re.compile(r'\(([^()]*)\)\s*(?:as\s+[\w.]+\s*)?=>')
+
+def m_name(name):
+    """Nome sem a sintaxe #"..." das consultas e passos com espaços ou acentos"""
+    return name[2:-1].replace('""', '"') if name.startswith('#"') else name
+
+def m_parameters(expressions):
+    """Valor de cada parâmetro do dataset a partir de pares (nome, expressão M). Só entram as expressões que são um
+    texto literal; as demais não têm um valor conhecido sem executar o M"""
+    parameters = {}
+    for name, expression in expressions:
+        match = M_PARAMETER.fullmatch(expression) if isinstance(expression, str) else None
+        if match:
+            parameters[name] = match.group(1).replace('""', '"')
+    return parameters
+
+def m_query_references(expression, query_names):
+    """Nomes de outras consultas do modelo (tabelas ou expressões) referenciados no M, como #"Outra Tabela" ou Parametro.
+    Campos entre colchetes, como each [Produto], e nomes definidos na própria expressão (passos do let e parâmetros de
+    funções) não são consultas, mesmo que tenham o nome de uma"""
+    text = M_IDENTIFIERS_STRINGS_AND_COMMENTS.sub(lambda match: match.group(0) if match.group(0).startswith('#') else ' ', expression)
+    while True:
+        stripped = M_BRACKETS.sub(' ', text)
+        if stripped == text:
+            break
+        text = stripped
+
+    local_names = {m_name(name) for name in M_LET_STEP.findall(text)}
+    for parameters in M_FUNCTION_PARAMETERS.findall(text):
+        local_names |= {m_name(match.group(1)) for match in re.finditer(rf'({M_NAME})(?:\s+as\s+[\w.]+)?\s*(?:,|$)', parameters.strip())}
+
+    names = {m_name(match.group(0)) for match in re.finditer(rf'(?<![\w.#]){M_NAME}', text)}
+    return (names & query_names) - local_names
+
+DAX_TOKENS = re.compile(r'"(?:[^"]|"")*"|\'(?:[^\']|\'\')*\'|\[[^\]]*\]|//[^\n]*|--[^\n]*|/\*.*?\*/|\s+', re.S)
+
+WHITESPACE = re.compile(r'\s+')
+
+def compact_dax(expression):
+    """DAX sem comentários e sem espaços desnecessários. Textos, tabelas entre aspas e colunas entre colchetes ficam
+    intactos, e um espaço só é mantido entre duas palavras ou onde a junção formaria um comentário, como em 1 - -1"""
+    if not isinstance(expression, str):
+        return expression
+
+    pieces, position, space = [], 0, False
+    for match in DAX_TOKENS.finditer(expression):
+        # O que fica entre os tokens (palavras, números e operadores) é copiado como está
+        if match.start() > position:
+            pieces.append((expression[position:match.start()], space))
+            space = False
+        token = match.group(0)
+        if token[0].isspace() or token.startswith(('//', '--', '/*')):
+            space = True
+        else:
+            pieces.append((token, space))
+            space = False
+        position = match.end()
+    if position < len(expression):
+        pieces.append((expression[position:], space))
+
+    text = ''
+    for piece, space in pieces:
+        if space and text and needs_space(text[-1], piece[0]):
+            text += ' '
+        text += piece
+    return text
+
+def needs_space(left, right):
+    """Se o espaço entre os dois caracteres é necessário para não juntar palavras nem formar um comentário"""
+    word = lambda char: char.isalnum() or char in '_.'
+    return (word(right) and (word(left) or left in ')]')) or (left in '-/*' and right in '-/*')
+
+def compact_m(expression, query_names=frozenset()):
+    """M sem comentários e com os espaços colapsados. Expressões longas são resumidas nas fontes que leem
+    (conector e argumentos, como servidor e banco), nas consultas do modelo que referenciam e nas transformações usadas"""
+    if not isinstance(expression, str):
+        return expression
+
+    text = M_STRINGS_AND_COMMENTS.sub(lambda match: match.group(0) if match.group(0).startswith('"') else ' ', expression)
+    text = WHITESPACE.sub(' ', text).strip()
+    if len(text) <= M_SUMMARY_MIN_CHARS:
+        return text
+
+    sources = m_sources(text)
+    source_names = {connector for connector, _ in sources}
+    masked = M_STRING.sub('""', text)
+    steps = dict.fromkeys(match.group(1) for match in M_FUNCTION_CALL.finditer(masked) if match.group(1) not in source_names)
+    references = sorted(m_query_references(text, query_names))
+
+    summary = [f"fonte {connector}({', '.join(json.dumps(argument, ensure_ascii=False) for argument in arguments)})" for connector, arguments in dict.fromkeys(sources)]
+    if references:
+        summary.append(f"consultas {', '.join(references)}")
+    if steps:
+        summary.append(f"transformações {', '.join(steps)}")
+    return '; '.join(summary) or text[:M_SUMMARY_MIN_CHARS] + '...'
@@ -0,0 +1,490 @@
+"""Cliente da API de administração do Power BI: cotas, scanner de workspaces, snapshots e leitura do scanResult"""
+import gzip
+import json
+import mmap
+import os
+import pandas as pd
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from itertools import islice
+
+from documentador.config import API_QUOTAS, MAX_LISTED_WORKSPACES, MAX_MODIFIED_SINCE, MAX_WORKSPACES_PER_SCAN, POWERBI_API_URL, SCAN_CHUNK_BYTES, SNAPSHOT_DIR, WORKSPACES_PAGE_SIZE
+from documentador.metrics import get_metrics, timed
+from documentador.models import ReportModel, ScanIndex
+
+class RateLimiter:
+    """Token bucket com uma ou mais janelas (por exemplo 15 por minuto e 50 por hora), compartilhado por todas as sessões do processo.
+    Um 429 bloqueia o limitador inteiro pelo tempo indicado no Retry-After"""
+
+    def __init__(self, quotas):
+        self.quotas = quotas
+        self.buckets = [float(capacity) for capacity, _ in quotas]
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        for i, (capacity, period) in enumerate(self.quotas):
+            self.buckets[i] = min(capacity, self.buckets[i] + elapsed * capacity / period)
+
+    def acquire(self):
+        """Espera até existir uma ficha disponível em todas as janelas e a consome"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    missing = [(1 - tokens) * period / capacity for tokens, (capacity, period) in zip(self.buckets, self.quotas) if tokens < 1]
+                    if not missing:
+                        self.buckets = [tokens - 1 for tokens in self.buckets]
+                        return
+                    wait = max(missing)
+            time.sleep(wait)
+
+    def block(self, seconds):
+        """Bloqueia novas requisições por alguns segundos, usado quando a API responde 429"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def remaining(self):
+        """Quantidade estimada de requisições ainda disponíveis na janela mais restrita"""
+        with self.lock:
+            self._refill(time.monotonic())
+            return int(min(self.buckets))
+
+# Criados na importação, uma vez por processo, para que todas as threads e sessões dividam as mesmas cotas
+RATE_LIMITERS = {endpoint: RateLimiter(quotas) for endpoint, quotas in API_QUOTAS.items()}
+
+@lru_cache(maxsize=None)
+def get_session():
+    """Sessão HTTP com pool de conexões keep-alive compartilhada por todas as chamadas ao Power BI. O requests só é
+    importado na primeira chamada à API"""
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_rate_limiters():
+    """Um limitador por endpoint, compartilhado por todas as sessões do processo"""
+    return RATE_LIMITERS
+
+def endpoint_of(url):
+    """Endpoint da URL entre os que têm cota própria, ou default"""
+    for endpoint in API_QUOTAS:
+        if f'/{endpoint}' in url:
+            return endpoint
+    return 'default'
+
+def get_rate_limiter(url):
+    """Escolhe o limitador de acordo com o endpoint da URL"""
+    return get_rate_limiters()[endpoint_of(url)]
+
+def retry_after(response, attempt):
+    """Segundos a esperar depois de um 429, respeitando o Retry-After quando a API o informa"""
+    value = response.headers.get('Retry-After')
+    if value:
+        if value.isdigit():
+            return int(value)
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return 2 ** attempt
+
+def powerbi_request(method, url, headers, retries=5, **kwargs):
+    """Todas as chamadas ao Power BI passam por aqui: respeita as cotas do endpoint, reaproveita as conexões
+    da sessão e repete a requisição após um 429 esperando o Retry-After"""
+    endpoint = endpoint_of(url)
+    limiter = get_rate_limiters()[endpoint]
+    metrics = get_metrics()
+
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        metrics.set_gauge('powerbi_cota_restante', limiter.remaining(), endpoint=endpoint)
+        with metrics.span(f'powerbi_request {endpoint}'):
+            response = get_session().request(method, url, headers=headers, **kwargs)
+        metrics.increment('powerbi_requisicoes_total', endpoint=endpoint, status=response.status_code)
+        if response.status_code != 429 or attempt == retries:
+            return response
+        metrics.increment('powerbi_429_retentativas_total', endpoint=endpoint)
+        limiter.block(retry_after(response, attempt))
+        # Com stream=True a conexão só volta para o pool depois que a resposta é fechada
+        response.close()
+
+def get_workspaces_id(headers, filter=None, limit=MAX_LISTED_WORKSPACES, on_progress=None):
+    """Função para pegar o id e as workspaces. A listagem é paginada e interrompida ao atingir o limite, e nenhuma página
+    pede mais do que o limite, então apenas as workspaces exibidas são baixadas e ficam em memória. on_progress recebe o
+    total a cada página que chega. Os 429 (Too many requests) são tratados pelo powerbi_request"""
+    workspace_dict = {}
+    page_size = min(WORKSPACES_PAGE_SIZE, limit) if limit else WORKSPACES_PAGE_SIZE
+
+    for count, workspace in enumerate(islice(iter_workspaces(headers, filter, page_size), limit), 1):
+        name = workspace['name']
+        if name in workspace_dict:
+            name = f"{name} ({workspace['id']})"
+        workspace_dict[name] = workspace['id']
+
+        if on_progress and count % page_size == 0:
+            on_progress(count)
+
+    return workspace_dict
+
+def iter_workspaces(headers, filter=None, page_size=WORKSPACES_PAGE_SIZE):
+    """Percorre as workspaces do tenant com $top/$skip, devolvendo as workspaces de cada página assim que ela chega.
+    O filter é repassado como $filter do OData, por exemplo "state eq 'Active'" """
+    skip = 0
+
+    while True:
+        params = {'$top': page_size, '$skip': skip}
+        if filter:
+            params['$filter'] = filter
+
+        response = powerbi_request('GET', f'{POWERBI_API_URL}/admin/groups', headers, params=params)
+        response.raise_for_status()
+        page = response.json().get('value', [])
+
+        yield from page
+
+        if len(page) < page_size:
+            return
+        skip += page_size
+
+def workspace_filter(search=None, include_personal=False, state='Active'):
+    """Monta o $filter do OData usado na listagem de workspaces"""
+    conditions = []
+    if state:
+        conditions.append(f"state eq '{state}'")
+    if not include_personal:
+        conditions.append("type ne 'PersonalGroup'")
+    if search:
+        # Aspas simples são escapadas duplicando, como no OData
+        search = search.replace("'", "''")
+        conditions.append(f"contains(name,'{search}')")
+    return ' and '.join(conditions)
+
+def scan_workspace(headers, workspace_id):
+    """Função responsável por fazer um escaneamento na workspace e recuperar suas informações.
+    Utiliza dados da função get_workspaces_id para passar a workspaceid no body"""
+    return scan_workspaces_incremental(headers, [workspace_id]).get(workspace_id)
+
+@timed('scan_workspaces_incremental')
+def scan_workspaces_incremental(headers, workspace_ids):
+    """Escaneia apenas as workspaces sem snapshot local ou alteradas desde o último scan, segundo o workspaces/modified,
+    e junta o resultado com os snapshots das demais"""
+    started_at = datetime.now(timezone.utc)
+    workspace_ids = list(dict.fromkeys(workspace_ids))
+    scanned_at = {workspace_id: snapshot_time(workspace_id) for workspace_id in workspace_ids}
+
+    to_scan = [workspace_id for workspace_id, scan_time in scanned_at.items() if scan_time is None]
+    known = [workspace_id for workspace_id, scan_time in scanned_at.items() if scan_time is not None]
+
+    if known:
+        modified_since = min(scanned_at[workspace_id] for workspace_id in known)
+        if started_at - modified_since > MAX_MODIFIED_SINCE:
+            to_scan = workspace_ids
+        else:
+            modified = get_modified_workspaces(headers, modified_since)
+            to_scan += [workspace_id for workspace_id in known if workspace_id.lower() in modified]
+
+    results = scan_workspaces(headers, to_scan) if to_scan else {}
+    for workspace_id, workspace in results.items():
+        save_snapshot(workspace_id, workspace, started_at)
+
+    for workspace_id in workspace_ids:
+        if workspace_id not in results and scanned_at[workspace_id] is not None:
+            results[workspace_id] = load_snapshot(workspace_id)
+
+    return results
+
+def get_modified_workspaces(headers, modified_since):
+    """Retorna os ids (em minúsculo) das workspaces alteradas desde modified_since"""
+    params = {'modifiedSince': modified_since.strftime('%Y-%m-%dT%H:%M:%S.0000000Z')}
+    response = powerbi_request('GET', f'{POWERBI_API_URL}/admin/workspaces/modified', headers, params=params)
+    response.raise_for_status()
+    return {workspace['id'].lower() for workspace in response.json()}
+
+def snapshot_path(workspace_id):
+    return os.path.join(SNAPSHOT_DIR, f'{workspace_id.lower()}.json.gz')
+
+def snapshot_time(workspace_id):
+    """Momento do último scan salvo da workspace, guardado como data de modificação do snapshot, ou None se não existir"""
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(snapshot_path(workspace_id)), tz=timezone.utc)
+    except FileNotFoundError:
+        return None
+
+def load_snapshot(workspace_id):
+    """Lê o último resultado de scan salvo da workspace. O snapshot é descomprimido para um arquivo temporário e lido
+    como ScanFile, sem carregar o JSON inteiro"""
+    file = tempfile.TemporaryFile()
+    with gzip.open(snapshot_path(workspace_id), 'rb') as snapshot:
+        shutil.copyfileobj(snapshot, file, SCAN_CHUNK_BYTES)
+    workspaces = ScanFile(file, single_workspace=True).workspaces
+    return workspaces[0] if workspaces else {}
+
+def save_snapshot(workspace_id, workspace, scanned_at):
+    """Salva o resultado do scan comprimido. A data de modificação do arquivo recebe o início do scan,
+    para que alterações feitas durante o scan apareçam no próximo workspaces/modified"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(workspace_id)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+
+    with gzip.open(temp_path, 'wb') as file:
+        if isinstance(workspace, ScanWorkspace):
+            workspace.write_to(file)
+        else:
+            file.write(json.dumps(workspace).encode('utf-8'))
+
+    timestamp = scanned_at.timestamp()
+    os.utime(temp_path, (timestamp, timestamp))
+    os.replace(temp_path, path)
+
+@timed('scan_workspaces')
+def scan_workspaces(headers, workspace_ids, max_workers=4, timeout=600):
+    """Escaneia várias workspaces agrupando até 100 ids por chamada do getInfo. O status de cada scan é consultado
+    com backoff adaptativo e os resultados prontos são baixados em paralelo e devolvidos por workspace"""
+    workspace_ids = list(dict.fromkeys(workspace_ids))
+    # A API devolve os ids em minúsculo, então o retorno é mapeado de volta para o id solicitado
+    requested = {workspace_id.lower(): workspace_id for workspace_id in workspace_ids}
+
+    batches = [workspace_ids[i:i + MAX_WORKSPACES_PER_SCAN] for i in range(0, len(workspace_ids), MAX_WORKSPACES_PER_SCAN)]
+    scan_ids = [start_scan(headers, batch) for batch in batches]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(get_scan_result, headers, scan_id) for scan_id in wait_scans(headers, scan_ids, timeout)]
+        for future in futures:
+            for workspace in future.result().get('workspaces', []):
+                workspace_id = requested.get(workspace['id'].lower(), workspace['id'])
+                results[workspace_id] = workspace
+
+    return results
+
+def start_scan(headers, workspace_ids):
+    """Inicia um scan para um lote de até 100 workspaces e retorna o id do scan"""
+    url = f'{POWERBI_API_URL}/admin/workspaces/getInfo?datasetSchema=True&datasetExpressions=True'
+    body = {"workspaces": list(workspace_ids)}
+
+    response = powerbi_request('POST', url, headers, json=body)
+    response.raise_for_status()
+    return response.json()['id']
+
+def wait_scans(headers, scan_ids, timeout=600, first_delay=0.5, max_delay=30):
+    """Consulta o scanStatus dos scans pendentes e devolve cada id assim que ele termina. O intervalo entre as consultas
+    começa curto, para scans rápidos, e dobra a cada rodada até max_delay, para não gastar requisições em scans lentos"""
+    pending = list(scan_ids)
+    delay = first_delay
+    deadline = time.monotonic() + timeout
+
+    while pending:
+        for scan_id in list(pending):
+            response = powerbi_request('GET', f'{POWERBI_API_URL}/admin/workspaces/scanStatus/{scan_id}', headers)
+            response.raise_for_status()
+            status = response.json().get('status')
+
+            if status == 'Succeeded':
+                pending.remove(scan_id)
+                yield scan_id
+            elif status == 'Failed':
+                raise RuntimeError(f'O scan {scan_id} falhou')
+
+        if not pending:
+            break
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f'Os scans {", ".join(pending)} não terminaram em {timeout} segundos')
+
+        with get_metrics().span('scan_espera'):
+            time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+@timed('scan_resultado')
+def get_scan_result(headers, scan_id):
+    """Baixa o resultado de um scan finalizado direto para um arquivo temporário, aos pedaços, sem montar o JSON na memória"""
+    response = powerbi_request('GET', f'{POWERBI_API_URL}/admin/workspaces/scanResult/{scan_id}', headers, stream=True)
+    with response:
+        response.raise_for_status()
+        file = tempfile.TemporaryFile()
+        for chunk in response.iter_content(chunk_size=SCAN_CHUNK_BYTES):
+            file.write(chunk)
+    return ScanFile(file)
+
+# Strings JSON inteiras (grupo 2 presente quando a string é uma chave) e colchetes/chaves fora delas
+SCAN_TOKENS = re.compile(rb'"((?:[^"\\]|\\.)*)"(\s*:)?|[{}\[\]]', re.S)
+
+SCAN_DECODER = json.JSONDecoder()
+
+SCAN_SCALAR = re.compile(rb'\s*("(?:[^"\\]|\\.)*"|[^\s,}\]]+)', re.S)
+
+class ScanFile:
+    """Resultado do scanResult, ou um snapshot de uma workspace, lido de um arquivo mapeado em memória sem carregar o
+    JSON inteiro. Uma única passada guarda os campos simples de cada workspace (id, name, state...) e a posição de cada
+    dataset no arquivo; os datasets só são interpretados quando pedidos, um de cada vez. Assim o pico de memória
+    depende do maior dataset, e não do tamanho da resposta"""
+
+    def __init__(self, file, single_workspace=False):
+        self.file = file
+        self.file.flush()
+        self.workspaces = []
+        self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+        # Caminho de chaves até o objeto da workspace: a raiz, no snapshot, ou cada item de "workspaces", no scanResult
+        self.workspace_path = (None,) if single_workspace else (None, b'workspaces', None)
+        self.index()
+
+    def index(self):
+        workspace_path = list(self.workspace_path)
+        dataset_path = workspace_path + [b'datasets', None]
+        workspace_depth, dataset_depth = len(workspace_path), len(dataset_path)
+        # path guarda a chave de cada objeto ou lista aberto; os caminhos só são comparados na profundidade certa
+        types, path, key, workspace = [], [], None, None
+        position = 0
+
+        while True:
+            match = SCAN_TOKENS.search(self.data, position)
+            if match is None:
+                break
+            position = match.end()
+
+            if match.group(2) is not None:
+                key = match.group(1)
+                # Campos simples da workspace são guardados; listas e objetos (relatórios, dashboards...) são pulados
+                if workspace is not None and len(path) == workspace_depth:
+                    scalar = SCAN_SCALAR.match(self.data, position)
+                    if scalar and scalar.group(1)[:1] not in (b'{', b'['):
+                        workspace.campos[key.decode('utf-8')] = json.loads(scalar.group(1))
+                continue
+
+            token = match.group(0)[:1]
+            if token == b'"':
+                key = None
+            elif token == b'{' or token == b'[':
+                if token == b'{' and workspace is not None and len(path) + 1 == dataset_depth and path + [key] == dataset_path:
+                    # O dataset é pulado inteiro de uma vez, sem percorrer os tokens dele
+                    position = self.object_end(match.start())
+                    workspace.datasets_spans.append((match.start(), position))
+                    key = None
+                    continue
+                types.append(token)
+                path.append(key)
+                key = None
+                if token == b'{' and len(path) == workspace_depth and path == workspace_path:
+                    workspace = ScanWorkspace(self, match.start())
+            else:
+                if workspace is not None and types[-1] == b'{' and len(path) == workspace_depth:
+                    workspace.span = (workspace.span[0], position)
+                    self.workspaces.append(workspace)
+                    workspace = None
+                types.pop()
+                path.pop()
+                key = None
+
+    def object_end(self, start):
+        """Posição logo após o objeto JSON que começa em start. O objeto é lido pelo decodificador do json, em C, numa janela
+        que dobra até conter o objeto inteiro; só a janela fica na memória"""
+        window = SCAN_CHUNK_BYTES
+        while True:
+            chunk = self.data[start:start + window]
+            # Um caractere cortado no fim da janela é descartado; se fizer falta, a janela seguinte o inclui
+            text = chunk.decode('utf-8', errors='ignore')
+            try:
+                _, end = SCAN_DECODER.raw_decode(text)
+            except json.JSONDecodeError:
+                if start + window >= len(self.data):
+                    raise
+                window *= 2
+                continue
+            return start + len(text[:end].encode('utf-8'))
+
+    def get(self, key, default=None):
+        """Compatível com o JSON do scanResult: get('workspaces') devolve as workspaces do arquivo"""
+        return self.workspaces if key == 'workspaces' else default
+
+class ScanWorkspace:
+    """Uma workspace de um ScanFile: os campos simples já lidos e a posição dos datasets e da própria workspace no arquivo"""
+
+    def __init__(self, scan_file, start):
+        self.scan_file = scan_file
+        self.campos = {}
+        self.span = (start, None)
+        self.datasets_spans = []
+
+    def __getitem__(self, key):
+        return self.campos[key]
+
+    def get(self, key, default=None):
+        return self.campos.get(key, default)
+
+    def datasets(self):
+        """Interpreta e devolve os datasets um de cada vez"""
+        for start, end in self.datasets_spans:
+            yield json.loads(self.scan_file.data[start:end])
+
+    def write_to(self, file, chunk_size=None):
+        """Copia o JSON da workspace, como veio da API, para o arquivo"""
+        chunk_size = chunk_size or SCAN_CHUNK_BYTES
+        start, end = self.span
+        for position in range(start, end, chunk_size):
+            file.write(self.scan_file.data[position:min(position + chunk_size, end)])
+
+def scan_datasets(workspace):
+    """Datasets da workspace, seja ela lida de um ScanFile ou um JSON já carregado"""
+    if isinstance(workspace, ScanWorkspace):
+        return workspace.datasets()
+    return workspace.get('datasets', [])
+
+def clean_reports(reports, option):
+    """Função responsável por fazer a limpeza do JSON que é recebido através da API da Microsoft, ao serem inseridos as credenciais do APP, e logo após o armazena-lo no modelo normalizado (ReportModel)"""
+    return index_scan(reports).get(option)
+
+@timed('index_scan')
+def index_scan(reports):
+    """Percorre o resultado do scan uma única vez e extrai o modelo de cada dataset, lendo um dataset de cada vez quando
+    a workspace vem de um ScanFile. Relatórios de uso e datasets que não são de import ficam fora da seleção, e nomes
+    repetidos recebem o id do dataset"""
+    models, report_names = {}, {}
+
+    for dataset in scan_datasets(reports):
+        models[dataset['id']] = dataset_model(dataset)
+
+        if 'PbixInImportMode' in dataset.get('contentProviderType', '') and 'Usage Metrics Report' not in dataset['name']:
+            name = dataset['name']
+            if name in report_names:
+                name = f"{name} ({dataset['id']})"
+            report_names[name] = dataset['id']
+
+    return ScanIndex(modelos=models, relatorios=report_names)
+
+def dataset_model(dataset):
+    """Monta o modelo normalizado de um dataset do scan a partir de listas, sem json_normalize"""
+    table_rows, column_rows, measure_rows = [], [], []
+
+    for table in dataset.get('tables', []):
+        table_name = table['name']
+        sources = table.get('source') or [{}]
+        table_rows.append((dataset['id'], dataset['name'], table_name, table.get('storageMode'), sources[0].get('expression'), dataset.get('configuredBy')))
+
+        for measure in table.get('measures', []):
+            measure_rows.append((table_name, measure['name'], measure.get('expression', 'N/A')))
+
+        for col in table.get('columns', []):
+            column_rows.append((table_name, col['name'], col.get('dataType'), col.get('columnType'), col.get('expression', 'N/A')))
+
+    expression_rows = [(expression['name'], expression.get('expression')) for expression in dataset.get('expressions', [])]
+
+    return ReportModel(
+        tabelas=pd.DataFrame(table_rows, columns=['DatasetId', 'ReportName', 'NomeTabela', 'storageMode', 'FonteDados', 'configuredBy']),
+        colunas=pd.DataFrame(column_rows, columns=['NomeTabela', 'NomeColuna', 'TipoDadoColuna', 'TipoColuna', 'ExpressaoColuna']),
+        medidas=pd.DataFrame(measure_rows, columns=['NomeTabela', 'NomeMedida', 'ExpressaoMedida']),
+        expressoes=pd.DataFrame(expression_rows, columns=['NomeExpressao', 'ExpressaoM'])
+    )
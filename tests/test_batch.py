@@ -0,0 +1,42 @@
+"""Roda o modo em lote de ponta a ponta, em outro processo, contra o chat completions local dos benchmarks"""
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.stand_ins import ChatStandIn
+from benchmarks.synthetic import generate_pbit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_batch(tmp_path, chat, *args):
+    env = {
+        **os.environ,
+        'OPENAI_BASE_URL': chat.api_url,
+        'API_KEY': 'teste',
+        'LLM_CACHE_DIR': str(tmp_path / 'llm'),
+        'DOCUMENTATION_DIR': str(tmp_path / 'documentacoes'),
+        'CATALOG_PATH': str(tmp_path / 'catalogo.sqlite'),
+    }
+    return subprocess.run([sys.executable, '-m', 'documentador.batch', *args], cwd=ROOT, env=env, capture_output=True, text=True)
+
+def test_pbit_dir(tmp_path):
+    pbit_dir = tmp_path / 'relatorios'
+    pbit_dir.mkdir()
+    for seed, folder in enumerate(['a', 'b']):
+        (pbit_dir / folder).mkdir()
+        (pbit_dir / folder / 'Vendas.pbit').write_bytes(generate_pbit(30, seed=seed))
+    output_dir = tmp_path / 'saida'
+
+    with ChatStandIn() as chat:
+        result = run_batch(tmp_path, chat, '--pbit-dir', str(pbit_dir), '--saida', str(output_dir), '--processos', '1')
+    assert result.returncode == 0, result.stderr
+
+    reports = json.loads((output_dir / 'job.json').read_text(encoding='utf-8'))['relatorios']
+    assert sorted(reports) == [os.path.join('a', 'Vendas.pbit'), os.path.join('b', 'Vendas.pbit')]
+    for entry in reports.values():
+        assert entry['status'] == 'concluido'
+        assert sorted(os.path.splitext(path)[1] for path in entry['saidas']) == ['.docx', '.xlsx']
+        assert all(os.path.getsize(path) > 0 for path in entry['saidas'])
+    outputs = [path for entry in reports.values() for path in entry['saidas']]
+    assert len(set(outputs)) == 4
@@ -0,0 +1,46 @@
+"""Busca no catálogo local"""
+import pytest
+
+from documentador import catalog
+from documentador.scanner import dataset_model
+
+def dataset(dataset_id, server):
+    return {
+        'id': dataset_id,
+        'name': f'Relatorio {dataset_id}',
+        'tables': [{
+            'name': 'Vendas',
+            'source': [{'expression': f'let Fonte = Sql.Database("{server}", "vendas") in Fonte'}],
+            'measures': [{'name': 'Total', 'expression': 'SUM(Vendas[Valor])'}],
+            'columns': [{'name': 'Valor', 'dataType': 'Double'}],
+        }],
+    }
+
+@pytest.fixture
+def filled_catalog(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', str(tmp_path / 'catalogo.sqlite'))
+    catalog.save_to_catalog(dataset_model(dataset('a', 'srv_dw')), 'scanner', 'ws')
+    catalog.save_to_catalog(dataset_model(dataset('b', 'srvXdw')), 'scanner', 'ws')
+
+@pytest.mark.parametrize('text', ['', '   '])
+def test_blank_search(filled_catalog, text):
+    assert catalog.search_expressions(text).empty
+    assert catalog.search_sources(text).empty
+
+def test_expressions(filled_catalog):
+    assert set(catalog.search_expressions('SUM Valor')['Relatorio']) == {'Relatorio a', 'Relatorio b'}
+
+def test_sources_like_is_literal(filled_catalog):
+    assert list(catalog.search_sources('srv_dw')['Relatorio']) == ['Relatorio a']
+    assert catalog.search_sources('100%').empty
+
+def test_sources_from_parameters(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', str(tmp_path / 'catalogo.sqlite'))
+    parameterized = dataset('p', 'ignorado')
+    parameterized['tables'][0]['source'] = [{'expression': 'let Fonte = Sql.Database(Servidor, "vendas") in Fonte'}]
+    parameterized['expressions'] = [{'name': 'Servidor', 'expression': '"meu-servidor" meta [IsParameterQuery=true, Type="Text"]'}]
+    catalog.save_to_catalog(dataset_model(parameterized), 'scanner', 'ws')
+
+    found = catalog.search_sources('meu-servidor')
+    assert list(found['Relatorio']) == ['Relatorio p']
+    assert list(found['Argumentos']) == ['meu-servidor, vendas']
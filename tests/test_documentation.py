@@ -0,0 +1,77 @@
+"""Junção das respostas dos lotes do LLM e do stream da resposta"""
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from documentador import documentation
+from documentador.config import LLM_MAX_OUTPUT_TOKENS, LLM_TOKENS_PER_ITEM
+from documentador.exporters import DocumentationExcel
+
+def fake_document_batch(prompt, section, header, items, on_item=None):
+    """Uma única conexão alimenta todas as tabelas do lote"""
+    result = [{'Nome': 'SQL Server - DW', 'Descricao': 'Data warehouse', 'Tabelas_Contidas_no_M': [name for name, _ in items]}]
+    for item in result:
+        if on_item:
+            on_item(section, item)
+    return result
+
+def test_sources_merged_across_batches(monkeypatch):
+    monkeypatch.setattr(documentation, 'document_batch', fake_document_batch)
+    tables = [f'Tabela {i}' for i in range(3 * LLM_MAX_OUTPUT_TOKENS // LLM_TOKENS_PER_ITEM)]
+    sections = {'Fontes_de_Dados': ('Fontes:', [(name, f'{name} | Sql.Database("dw", "vendas")') for name in tables])}
+
+    streamed = []
+    result = documentation.Documenta('prompt', sections, on_item=lambda section, item: streamed.append(item))
+
+    assert len(streamed) > 1
+    assert [source['Nome'] for source in result.fontes] == ['SQL Server - DW']
+    assert result.fontes[0]['Tabelas_Contidas_no_M'] == tables
+
+def test_excel_sources_merged_across_batches():
+    openpyxl = pytest.importorskip('openpyxl')
+    excel = DocumentationExcel(pd.DataFrame(columns=['NomeMedida', 'ExpressaoMedida']))
+    excel.add('Fontes_de_Dados', {'Nome': 'S', 'Descricao': 'd', 'Tabelas_Contidas_no_M': ['A', 'B']})
+    excel.add('Fontes_de_Dados', {'Nome': 'S', 'Descricao': 'd', 'Tabelas_Contidas_no_M': ['C', 'A']})
+    sheet = openpyxl.load_workbook(BytesIO(excel.close().getvalue()))['fonte_de_dados']
+    assert [row for row in sheet.iter_rows(min_row=2, values_only=True)] == [('S', 'd', 'A, B, C')]
+
+def test_documented_version_ignored_after_model_or_prompt_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(documentation, 'DOCUMENTATION_DIR', str(tmp_path))
+    sections = {'Tabelas_do_Relatorio': ('Tabelas:', [('Vendas', 'Vendas | Sql.Database("dw")')])}
+    documented = documentation.Documentation(relatorio={}, tabelas=[{'Nome': 'Vendas', 'Descricao': 'd'}], medidas=[], fontes=[])
+    documentation.save_documented_version('relatorio', sections, documented)
+    assert documentation.load_documented_version('relatorio') is not None
+
+    monkeypatch.setattr(documentation, 'PROMPT_VERSION', 'outra')
+    assert documentation.load_documented_version('relatorio') is None
+    monkeypatch.undo()
+    monkeypatch.setattr(documentation, 'DOCUMENTATION_DIR', str(tmp_path))
+    monkeypatch.setattr(documentation, 'LLM_MODEL', 'outro-modelo')
+    assert documentation.load_documented_version('relatorio') is None
+
+def test_llm_cache_eviction_is_not_run_on_every_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(documentation, 'LLM_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(documentation, 'LLM_CACHE_STATE', {**documentation.LLM_CACHE_STATE, 'size': None, 'evicted_at': 0.0, 'evicting': False})
+    walks = []
+    evict = documentation.evict_llm_cache
+    monkeypatch.setattr(documentation, 'evict_llm_cache', lambda: walks.append(1) or evict())
+
+    for i in range(50):
+        documentation.write_llm_cache(f'{i:064x}', {'resposta': 'x' * 100})
+    assert len(walks) == 1
+
+    monkeypatch.setattr(documentation, 'LLM_CACHE_MAX_BYTES', documentation.LLM_CACHE_STATE['size'] + 50)
+    documentation.write_llm_cache(f'{50:064x}', {'resposta': 'x' * 100})
+    assert len(walks) == 2
+    assert documentation.LLM_CACHE_STATE['size'] <= documentation.LLM_CACHE_MAX_BYTES
+
+@pytest.mark.parametrize('section', list(documentation.DOCUMENTATION_SECTIONS))
+def test_section_prompt_keeps_only_the_requested_example(section):
+    full = documentation.prompt()
+    system = documentation.section_messages(full, 'T Vendas | fonte', section)[0]['content']
+
+    assert len(system) < len(documentation.compact_lines(full))
+    assert f'"{section}"' in system
+    assert all(f'"{other}"' not in system for other in documentation.DOCUMENTATION_SECTIONS if other != section)
+    assert system.endswith(documentation.compact_lines(full).splitlines()[-1])
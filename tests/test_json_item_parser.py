@@ -0,0 +1,52 @@
+"""Leitura dos itens da resposta do LLM conforme ela chega pelo stream"""
+import json
+import random
+
+import pytest
+
+from documentador.documentation import JsonItemParser
+
+ITEMS = [
+    {'Nome': 'Total "líquido"', 'Descricao': 'Soma com {chaves} e [colchetes] dentro do texto \\ ☃'},
+    {'Nome': 'Fonte', 'Descricao': 'Aspas escapadas: \\"', 'Tabelas_Contidas_no_M': ['A', 'B'], 'Extra': {'Aninhado': [{'x': 1}]}},
+    {'Nome': 'Vazio', 'Descricao': ''},
+]
+
+RESPONSES = {
+    'objeto': json.dumps({'Medidas_do_Relatorio': ITEMS}, ensure_ascii=False, indent=2),
+    'lista': json.dumps(ITEMS, ensure_ascii=False),
+    'escapado': json.dumps({'Medidas_do_Relatorio': ITEMS}),
+}
+
+def feed_chunks(text, sizes):
+    parser, items, position = JsonItemParser(), [], 0
+    for size in sizes:
+        items += parser.feed(text[position:position + size])
+        position += size
+    return items + parser.feed(text[position:])
+
+@pytest.mark.parametrize('shape', RESPONSES)
+def test_whole_response(shape):
+    assert JsonItemParser().feed(RESPONSES[shape]) == ITEMS
+
+@pytest.mark.parametrize('shape', RESPONSES)
+@pytest.mark.parametrize('seed', range(5))
+def test_chunked_response(shape, seed):
+    rng = random.Random(seed)
+    text = RESPONSES[shape]
+    assert feed_chunks(text, [rng.randint(1, 16) for _ in range(len(text))]) == ITEMS
+
+@pytest.mark.parametrize('shape', RESPONSES)
+def test_one_char_at_a_time(shape):
+    text = RESPONSES[shape]
+    assert feed_chunks(text, [1] * len(text)) == ITEMS
+
+def test_items_arrive_as_soon_as_they_close():
+    first = '[' + json.dumps(ITEMS[0], ensure_ascii=False)
+    parser = JsonItemParser()
+    assert parser.feed(first[:-1]) == []
+    assert parser.feed(first[-1:]) == ITEMS[:1]
+    assert parser.feed(RESPONSES['lista'][len(first):]) == ITEMS[1:]
+
+def test_summary_object_is_not_an_item():
+    assert JsonItemParser().feed(json.dumps({'Relatorio': {'Titulo': 'x', 'Exemplos_de_Uso': ['a']}})) == []
@@ -0,0 +1,96 @@
+"""Linhagem e referências entre consultas M"""
+import pytest
+
+from documentador.lineage import Node, build_lineage, dax_references
+from documentador.parsers import m_query_references
+from documentador.scanner import dataset_model
+
+QUERIES = {'Produto', 'Vendas', 'Outra Tabela', 'Servidor', 'Data', 'Clientes'}
+
+@pytest.mark.parametrize('expression, expected', [
+    ('let Fonte = Sql.Database(Servidor, "dw") in Fonte', {'Servidor'}),
+    ('let Linhas = Table.SelectRows(Fonte, each [Produto] <> null) in Linhas', set()),
+    ('let Navegacao = Fonte{[Schema="dbo",Item="Produto"]}[Data] in Navegacao', set()),
+    ('let Vendas = Fonte{0}, Produto = Vendas[Produto] in Produto', set()),
+    ('let #"Outra Tabela" = 1 in #"Outra Tabela"', set()),
+    ('let Dobro = (Produto as number) => Produto * 2 in Dobro', set()),
+    ('let Origem = #"Outra Tabela", Juncao = Table.NestedJoin(Origem, {"id"}, Clientes, {"id"}, "c") in Juncao', {'Outra Tabela', 'Clientes'}),
+    ('// Produto\nlet Texto = "Produto" /* Vendas */ in Data', {'Data'}),
+])
+def test_m_query_references(expression, expected):
+    assert m_query_references(expression, QUERIES) == expected
+
+def table(name, expression):
+    return {'name': name, 'source': [{'expression': expression}], 'columns': [{'name': 'Id', 'dataType': 'Int64'}]}
+
+def test_field_access_is_not_a_dependency():
+    dataset = {
+        'id': 'd1',
+        'name': 'Vendas',
+        'tables': [
+            table('Produto', 'let Fonte = Sql.Database("srv", "dw") in Fonte'),
+            table('Vendas', 'let Fonte = Sql.Database("srv", "dw"), Linhas = Table.SelectRows(Fonte, each [Produto] <> null) in Linhas'),
+            table('Resumo', 'let Origem = Vendas in Origem'),
+        ],
+    }
+    lineage = build_lineage([dataset_model(dataset)])
+
+    assert Node('tabela', 'd1', 'Vendas', 'Vendas') not in lineage.impact(Node('tabela', 'd1', 'Produto', 'Produto'))
+    assert Node('tabela', 'd1', 'Resumo', 'Resumo') in lineage.impact(Node('tabela', 'd1', 'Vendas', 'Vendas'))
+
+def parameterized_dataset(dataset_id, server, source='Sql.Database(Servidor, "dw")'):
+    return {
+        'id': dataset_id,
+        'name': f'Relatorio {dataset_id}',
+        'tables': [table('Vendas', f'let Fonte = {source} in Fonte')],
+        'expressions': [{'name': 'Servidor', 'expression': f'"{server}" meta [IsParameterQuery=true, Type="Text", IsParameterQueryRequired=true]'}],
+    }
+
+def test_parameterized_sources_resolved():
+    lineage = build_lineage([dataset_model(parameterized_dataset(dataset_id, server)) for dataset_id, server in (('a', 'srv-prod'), ('b', 'srv-teste'), ('c', 'srv-prod'))])
+
+    impacted = {node.dataset for node in lineage.impact(Node('fonte', None, 'Sql.Database', 'srv-prod, dw'))}
+    assert impacted == {'a', 'c'}
+    assert {node.dataset for node in lineage.impact(Node('fonte', None, 'Sql.Database', 'srv-teste, dw'))} == {'b'}
+
+def test_unresolved_sources_stay_in_their_dataset():
+    models = [dataset_model(parameterized_dataset(dataset_id, 'srv', 'Sql.Database(Servidor & ".database.windows.net", "dw")')) for dataset_id in 'ab']
+    lineage = build_lineage(models)
+
+    sources = lineage.nodes('fonte')
+    assert sorted(node.dataset for node in sources) == ['a', 'b']
+    assert {node.dataset for node in lineage.impact(Node('fonte', 'a', 'Sql.Database', ''))} == {'a'}
+
+TABLES = {'Vendas', 'Dim Produto', "O'Brien"}
+COLUMNS = {('Vendas', 'Valor'), ('Vendas', 'Quantidade'), ('Dim Produto', 'Preço'), ("O'Brien", 'Id')}
+MEASURES = {'Total Vendas': 'Vendas', 'Margem': 'Dim Produto'}
+
+def references(expression, table='Vendas'):
+    return dax_references(expression, 'd', table, TABLES, COLUMNS, MEASURES)
+
+@pytest.mark.parametrize('expression, expected', [
+    ("SUM('Dim Produto'[Preço])", {Node('coluna', 'd', 'Dim Produto', 'Preço')}),
+    ('SUM(Vendas[Valor])', {Node('coluna', 'd', 'Vendas', 'Valor')}),
+    ("COUNTROWS('O''Brien')", {Node('tabela', 'd', "O'Brien", "O'Brien")}),
+    ('[Total Vendas] * 2', {Node('medida', 'd', 'Vendas', 'Total Vendas')}),
+    ('Vendas[Total Vendas]', {Node('medida', 'd', 'Vendas', 'Total Vendas')}),
+    ('[Valor] * [Quantidade]', {Node('coluna', 'd', 'Vendas', 'Valor'), Node('coluna', 'd', 'Vendas', 'Quantidade')}),
+    ('CALCULATE([Margem], ALL(Vendas))', {Node('medida', 'd', 'Dim Produto', 'Margem'), Node('tabela', 'd', 'Vendas', 'Vendas')}),
+    ('COUNTROWS(Vendas)', {Node('tabela', 'd', 'Vendas', 'Vendas')}),
+    ("ALL('Dim Produto')", {Node('tabela', 'd', 'Dim Produto', 'Dim Produto')}),
+])
+def test_dax_references(expression, expected):
+    assert references(expression) == expected
+
+def test_dax_references_ignore_strings_and_comments():
+    expression = '''
+        // COUNTROWS(Vendas)
+        -- [Total Vendas]
+        /* 'Dim Produto'[Preço]
+           ALL(Vendas) */
+        IF([Margem] > 0, "Vendas[Valor] e ""[Quantidade]""", "-- nada")
+    '''
+    assert references(expression) == {Node('medida', 'd', 'Dim Produto', 'Margem')}
+
+def test_dax_variables_are_not_tables():
+    assert references('VAR Total = SUM(Vendas[Valor]) RETURN Total') == {Node('coluna', 'd', 'Vendas', 'Valor')}
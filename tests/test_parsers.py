@@ -0,0 +1,67 @@
+"""Compactação do DAX e do M enviados ao LLM e leitura das fontes do M"""
+import pytest
+
+from documentador.config import M_SUMMARY_MIN_CHARS
+from documentador.parsers import compact_dax, compact_m, m_sources
+
+@pytest.mark.parametrize('expression, expected', [
+    ('"a//b" & "c--d"', '"a//b"&"c--d"'),
+    ('"diz ""oi"" -- não é comentário"', '"diz ""oi"" -- não é comentário"'),
+    ('SUM ( Vendas[Valor] ) /* comentário\n em linhas */ + 1 -- fim', 'SUM(Vendas[Valor])+1'),
+    ('SUM(Vendas[Valor]) // fim\n+ 1', 'SUM(Vendas[Valor])+1'),
+    ("CALCULATE ( [Total  Vendas] , 'Dim  Produto'[Cor] = \"Azul  Claro\" )", "CALCULATE([Total  Vendas],'Dim  Produto'[Cor]=\"Azul  Claro\")"),
+    ('1 - -1', '1- -1'),
+    ('1 - - 1', '1- -1'),
+    ('x / /* c */ / y', 'x/ /y'),
+    ('VAR  a = 1\nRETURN\n  a', 'VAR a=1 RETURN a'),
+    ('IF ( a ) && NOT b', 'IF(a)&&NOT b'),
+])
+def test_compact_dax(expression, expected):
+    assert compact_dax(expression) == expected
+
+def test_compact_dax_keeps_non_text():
+    assert compact_dax(None) is None
+
+def test_compact_m_short():
+    expression = 'let\n    #"Tabela // Nova" = Fonte,\n    // comentário\n    Fonte = Web.Contents("https://x.com/a//b") /* c */\nin\n    #"Tabela // Nova"'
+    assert compact_m(expression) == 'let #"Tabela // Nova" = Fonte, Fonte = Web.Contents("https://x.com/a//b") in #"Tabela // Nova"'
+
+def long_m(*steps):
+    renames = ', '.join(f'#"Renomeado {i}" = Table.RenameColumns(Navegacao, {{{{"a{i}", "b{i}"}}}})' for i in range(10))
+    return f'let Fonte = Sql.Database("srv", "dw"), Navegacao = Fonte{{[Schema="dbo",Item="Vendas"]}}[Data], {renames}, {", ".join(steps)} in Final'
+
+def test_compact_m_summary():
+    expression = long_m('Final = Table.SelectRows(#"Renomeado 9", each [Ativo] = true)')
+    assert len(expression) > M_SUMMARY_MIN_CHARS
+    assert compact_m(expression) == 'fonte Sql.Database("srv", "dw"); transformações Table.RenameColumns, Table.SelectRows'
+
+def test_compact_m_summary_ignores_calls_in_strings():
+    expression = long_m('Final = Table.AddColumn(#"Renomeado 9", "Texto", each "Table.Fake(1) e Web.Contents(""x"")")')
+    assert compact_m(expression) == 'fonte Sql.Database("srv", "dw"); transformações Table.RenameColumns, Table.AddColumn'
+
+@pytest.mark.parametrize('expression, expected', [
+    ('Sql.Database("srv", "dw")', [('Sql.Database', ('srv', 'dw'))]),
+    ('Sql.Database("srv", "dw", [Query="select 1"])', [('Sql.Database', ('srv', 'dw'))]),
+    ('Web.Contents(Url & "/api")', [('Web.Contents', ())]),
+    ('Sql.Database(Servidor, "dw")', [('Sql.Database', ())]),
+    ('Sql.Database("srv", Banco)', [('Sql.Database', ('srv',))]),
+    ('Web.Contents("https://x.com/a//b") // OData.Feed("comentado")', [('Web.Contents', ('https://x.com/a//b',))]),
+    ('Csv.Document(File.Contents("C:\\dados\\""v""\\a.csv"))', [('File.Contents', ('C:\\dados\\"v"\\a.csv',))]),
+    ('Table.SelectRows(Fonte, each [A] = "Sql.Database(""x"")")', []),
+])
+def test_m_sources(expression, expected):
+    assert m_sources(expression) == expected
+
+def test_m_sources_with_parameters():
+    parameters = {'Servidor': 'srv-prod', 'Nome Banco': 'dw'}
+    assert m_sources('Sql.Database(Servidor, #"Nome Banco")', parameters) == [('Sql.Database', ('srv-prod', 'dw'))]
+    assert m_sources('Sql.Database(Outro, "dw")', parameters) == [('Sql.Database', ())]
+
+def test_compact_m_summary_query_references():
+    expression = long_m(
+        'Filtro = Table.SelectRows(#"Renomeado 9", each [Produto] <> null and [Vendas] > 0)',
+        'Juncao = Table.NestedJoin(Filtro, {"id"}, #"Dim Cliente", {"id"}, "c")',
+        'Final = Table.Join(Juncao, "id", Metas{[Ano=Ano]}[Data], "id")',
+    )
+    summary = compact_m(expression, {'Produto', 'Vendas', 'Dim Cliente', 'Metas', 'Navegacao', 'Data', 'Ano'})
+    assert 'consultas Dim Cliente, Metas;' in summary
@@ -0,0 +1,106 @@
+"""Leitura do scanResult em disco pelo ScanFile, sem carregar o JSON inteiro"""
+import json
+import tempfile
+
+import pytest
+
+from documentador import scanner
+from documentador.scanner import ScanFile, index_scan
+
+def dataset(dataset_id, name):
+    return {
+        'id': dataset_id,
+        'name': name,
+        'contentProviderType': 'PbixInImportMode',
+        'tables': [{
+            'name': 'Vendas "líquidas" {2024}',
+            'source': [{'expression': 'let Fonte = Sql.Database("srv\\\\dw", "vendas") in Fonte // } ] "'}],
+            'measures': [{'name': 'Total ação', 'expression': 'CALCULATE(SUM(Vendas[Valor]), "{[")'}],
+            'columns': [{'name': 'Descrição ☃', 'dataType': 'String'}],
+        }],
+    }
+
+SCAN_RESULT = {
+    'workspaces': [
+        {
+            'id': 'w1',
+            'name': 'Finanças "DW" {prod} [ok]',
+            'state': 'Active',
+            'reports': [{'id': 'r1', 'name': 'datasets', 'datasets': [{'id': 'não é um dataset da workspace'}]}],
+            'datasets': [dataset('d1', 'Vendas'), dataset('d2', 'Vendas')],
+            'isOnDedicatedCapacity': False,
+        },
+        {'id': 'w2', 'name': 'Vazia', 'datasets': []},
+    ]
+}
+
+def scan_file(content, **kwargs):
+    file = tempfile.TemporaryFile()
+    file.write(content.encode('utf-8'))
+    return ScanFile(file, **kwargs)
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_index(indent):
+    scan = scan_file(json.dumps(SCAN_RESULT, ensure_ascii=False, indent=indent))
+    workspaces = scan.get('workspaces')
+
+    assert [workspace['id'] for workspace in workspaces] == ['w1', 'w2']
+    assert workspaces[0].campos == {'id': 'w1', 'name': 'Finanças "DW" {prod} [ok]', 'state': 'Active', 'isOnDedicatedCapacity': False}
+    assert list(workspaces[0].datasets()) == SCAN_RESULT['workspaces'][0]['datasets']
+    assert list(workspaces[1].datasets()) == []
+
+def test_escaped_json():
+    scan = scan_file(json.dumps(SCAN_RESULT, ensure_ascii=True))
+    assert list(scan.get('workspaces')[0].datasets()) == SCAN_RESULT['workspaces'][0]['datasets']
+
+@pytest.mark.parametrize('window', range(1, 40))
+def test_multibyte_at_window_edge(monkeypatch, window):
+    monkeypatch.setattr(scanner, 'SCAN_CHUNK_BYTES', window)
+    scan = scan_file(json.dumps(SCAN_RESULT, ensure_ascii=False))
+    assert list(scan.get('workspaces')[0].datasets()) == SCAN_RESULT['workspaces'][0]['datasets']
+
+def test_index_scan_repeated_names():
+    index = index_scan(scan_file(json.dumps(SCAN_RESULT, ensure_ascii=False)).get('workspaces')[0])
+    assert set(index.modelos) == {'d1', 'd2'}
+    assert index.relatorios == {'Vendas': 'd1', 'Vendas (d2)': 'd2'}
+
+def test_snapshot_round_trip():
+    workspace = scan_file(json.dumps(SCAN_RESULT, ensure_ascii=False)).get('workspaces')[0]
+    copy = tempfile.TemporaryFile()
+    workspace.write_to(copy, chunk_size=7)
+
+    single = scan_file(json.dumps(SCAN_RESULT['workspaces'][0], ensure_ascii=False), single_workspace=True).workspaces[0]
+    copied = ScanFile(copy, single_workspace=True).workspaces[0]
+    assert copied.campos == single.campos == workspace.campos
+    assert list(copied.datasets()) == SCAN_RESULT['workspaces'][0]['datasets']
+
+class FakeResponse:
+    def __init__(self, value):
+        self.value = value
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'value': self.value}
+
+@pytest.mark.parametrize('limit, expected_tops, expected_progress', [
+    (1000, [1000], [1000]),
+    (12000, [5000, 5000, 5000], [5000, 10000]),
+    (None, [5000, 5000, 5000], [5000, 10000]),
+])
+def test_workspace_pages_never_exceed_the_limit(monkeypatch, limit, expected_tops, expected_progress):
+    workspaces = [{'id': f'id{i}', 'name': f'Workspace {i}'} for i in range(11000)]
+    tops = []
+
+    def fake_request(method, url, headers, params):
+        tops.append(params['$top'])
+        return FakeResponse(workspaces[params['$skip']:params['$skip'] + params['$top']])
+
+    monkeypatch.setattr(scanner, 'powerbi_request', fake_request)
+    progress = []
+    result = scanner.get_workspaces_id({}, limit=limit, on_progress=progress.append)
+
+    assert tops == expected_tops
+    assert len(result) == min(limit or len(workspaces), len(workspaces))
+    assert progress == expected_progress